@@ -0,0 +1,72 @@
+"""
+Authentication by email address.
+v1.2 - Email backend with a single indexed user lookup
+v1.3 - Users of logged-in sessions resolved from the cache
+"""
+
+from allauth.account.auth_backends import AuthenticationBackend
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db.models.functions import Lower
+
+
+def users_with_email(email):
+    """
+    Users whose email matches ``email`` case-insensitively. Compares
+    LOWER(email), the expression migration 0002 indexes, so the lookup is
+    a single index probe.
+    """
+    UserModel = get_user_model()
+    return UserModel._default_manager.alias(email_lower=Lower('email')).filter(email_lower=email.lower())
+
+
+def user_cache_key(user_id):
+    return f'auth_user:{user_id}'
+
+
+class CachedUserMixin:
+    """
+    Resolve the user of a logged-in session from the cache, so requests
+    do not query the user table. The signals in accounts.signals drop the
+    entry whenever the user is saved or deleted or their groups or
+    permissions change, and a password change
+    still ends other sessions: the fresh user's session hash no longer
+    matches theirs.
+    """
+
+    def get_user(self, user_id):
+        if not settings.AUTH_USER_CACHE_TIMEOUT:
+            return super().get_user(user_id)
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is None:
+                return None
+            cache.set(key, user, settings.AUTH_USER_CACHE_TIMEOUT)
+        return user if self.user_can_authenticate(user) else None
+
+
+class EmailBackend(CachedUserMixin, ModelBackend):
+    """Authenticate with ``email`` and ``password``, fetching the user in one query"""
+
+    def authenticate(self, request, email=None, password=None, **kwargs):
+        if email is None and 'username' in kwargs:
+            # The admin login form signs in by username.
+            return super().authenticate(request, password=password, **kwargs)
+        if not email or password is None:
+            return None
+        user = users_with_email(email).first()
+        if user is None:
+            # Hash anyway, so response time does not reveal which emails exist.
+            get_user_model()().set_password(password)
+            return None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
+
+
+class SocialAuthenticationBackend(CachedUserMixin, AuthenticationBackend):
+    """allauth's backend, used for sessions started through allauth"""
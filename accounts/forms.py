@@ -4,6 +4,8 @@ from django.contrib.auth.forms import UserCreationForm
 from django.core.exceptions import ValidationError
 import re
 
+from .backends import users_with_email
+
 class CustomUserCreationForm(UserCreationForm):
     email = forms.EmailField(
         required=True,
@@ -30,7 +32,7 @@ class CustomUserCreationForm(UserCreationForm):
     
     def clean_email(self):
         email = self.cleaned_data.get('email')
-        if User.objects.filter(email=email).exists():
+        if users_with_email(email).exists():
             raise ValidationError("A user with this email already exists.")
         return email
     
@@ -66,7 +68,9 @@ class ForgotPasswordForm(forms.Form):
     
     def clean_email(self):
         email = self.cleaned_data.get('email')
-        if not User.objects.filter(email=email).exists():
+        # Kept for the view, which would otherwise fetch the user again.
+        self.user = users_with_email(email).first()
+        if self.user is None:
             raise ValidationError("No user found with this email address.")
         return email
 
@@ -0,0 +1,35 @@
+"""
+Password hashers whose work factors come from settings.
+v1.2 - Work factors sized with the calibrate_password_hashers command
+
+The algorithm names are Django's own, so existing hashes keep verifying.
+When a work factor changes, Django rehashes a user's password with the
+new one at their next successful login (see User.check_password).
+"""
+
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """PBKDF2-SHA256 with PASSWORD_PBKDF2_ITERATIONS iterations"""
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_PBKDF2_ITERATIONS or hashers.PBKDF2PasswordHasher.iterations
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    """Argon2id with the PASSWORD_ARGON2_* costs; needs the argon2-cffi package"""
+
+    @property
+    def time_cost(self):
+        return settings.PASSWORD_ARGON2_TIME_COST or hashers.Argon2PasswordHasher.time_cost
+
+    @property
+    def memory_cost(self):
+        return settings.PASSWORD_ARGON2_MEMORY_COST or hashers.Argon2PasswordHasher.memory_cost
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_ARGON2_PARALLELISM or hashers.Argon2PasswordHasher.parallelism
@@ -0,0 +1,108 @@
+import math
+import statistics
+import time
+
+from django.contrib.auth import hashers
+from django.core.management.base import BaseCommand
+
+# Per algorithm: the work factor attribute, how hashing time grows with
+# it, the setting it is read from (if any) and Django's default, which is
+# the floor for recommendations.
+WORK_FACTORS = {
+    'pbkdf2_sha256': ('iterations', 'linear', 'PASSWORD_PBKDF2_ITERATIONS', hashers.PBKDF2PasswordHasher.iterations),
+    'pbkdf2_sha1': ('iterations', 'linear', None, hashers.PBKDF2SHA1PasswordHasher.iterations),
+    'argon2': ('time_cost', 'linear', 'PASSWORD_ARGON2_TIME_COST', hashers.Argon2PasswordHasher.time_cost),
+    'bcrypt_sha256': ('rounds', 'log2', None, hashers.BCryptSHA256PasswordHasher.rounds),
+    'bcrypt': ('rounds', 'log2', None, hashers.BCryptPasswordHasher.rounds),
+    'scrypt': ('work_factor', 'power_of_two', None, hashers.ScryptPasswordHasher.work_factor),
+}
+
+
+class Command(BaseCommand):
+    help = ("Time the configured password hashers on this machine and recommend work factors "
+            "that hash a password in about --target-ms milliseconds")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target-ms', type=float, default=100.0,
+                            help="Time one password hash should take")
+        parser.add_argument('--samples', type=int, default=5,
+                            help="Hashes timed per measurement; the median is used")
+        parser.add_argument('--allow-weaker', action='store_true',
+                            help="Allow recommendations below Django's default work factors")
+
+    def handle(self, *args, **options):
+        self.samples = options['samples']
+        target = options['target_ms'] / 1000
+        env_lines = []
+
+        for index, hasher in enumerate(hashers.get_hashers()):
+            label = f"{hasher.algorithm}{' (preferred)' if index == 0 else ''}"
+            if hasher.algorithm not in WORK_FACTORS:
+                self.stdout.write(f"{label}: no tunable work factor, skipped.")
+                continue
+            attribute, growth, setting, default = WORK_FACTORS[hasher.algorithm]
+            if hasher.library:
+                try:
+                    hasher._load_library()
+                except ValueError:
+                    library = hasher.library[0] if isinstance(hasher.library, tuple) else hasher.library
+                    self.stdout.write(f"{label}: {library} not installed, skipped.")
+                    continue
+
+            current = getattr(hasher, attribute)
+            elapsed = self.measure(hasher)
+            value = self.scale(current, elapsed, target, growth)
+            floor = 1 if options['allow_weaker'] else default
+            if value < floor:
+                value = floor
+                self.stderr.write(
+                    f"{label}: Django's default {attribute}={floor} already takes longer than "
+                    f"{options['target_ms']:.0f} ms here; keeping it (--allow-weaker to go below)."
+                )
+            overrides = self.overrides(hasher, attribute, value)
+            expected = self.measure(type(f'Calibrated{type(hasher).__name__}', (type(hasher),), overrides)())
+
+            self.stdout.write(
+                f"{label}: {attribute}={current} takes {elapsed * 1000:.0f} ms; "
+                f"recommended {attribute}={value} ({expected * 1000:.0f} ms)"
+            )
+            if setting:
+                env_lines.append(f"{setting}={value}")
+            elif value != current:
+                attributes = ', '.join(f'{name} = {setting_value}' for name, setting_value in overrides.items())
+                env_lines.append(f"# {hasher.algorithm}: subclass its hasher with {attributes}")
+
+        if env_lines:
+            self.stdout.write("\nAdd to the environment (.env):")
+            for line in env_lines:
+                self.stdout.write(line)
+            self.stdout.write("Stored passwords are rehashed with the new settings at each user's next login.")
+
+    def measure(self, hasher):
+        salt = hasher.salt()
+        timings = []
+        for _ in range(self.samples):
+            start = time.perf_counter()
+            hasher.encode('calibration-password', salt)
+            timings.append(time.perf_counter() - start)
+        return statistics.median(timings)
+
+    def scale(self, current, elapsed, target, growth):
+        ratio = target / elapsed
+        if growth == 'log2':
+            # Each extra round doubles the time.
+            return max(current + round(math.log2(ratio)), 4)
+        if growth == 'power_of_two':
+            return 2 ** max(round(math.log2(current * ratio)), 1)
+        if current >= 10000:
+            # Round large iteration counts to a readable figure.
+            return max(int(round(current * ratio, -4)), 10000)
+        return max(round(current * ratio), 1)
+
+    def overrides(self, hasher, attribute, value):
+        overrides = {attribute: value}
+        if hasher.algorithm == 'scrypt':
+            # scrypt needs 128 * block_size * work_factor bytes; allow twice
+            # that, as OpenSSL's default limit is too low above 2**14.
+            overrides['maxmem'] = 256 * hasher.block_size * value * hasher.parallelism
+        return overrides
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from accounts.models import OTP_VALIDITY, OTPVerification
+
+
+class Command(BaseCommand):
+    help = "Delete used and expired password reset codes in small batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="Number of rows deleted per statement")
+        parser.add_argument('--sleep', type=float, default=0.0,
+                            help="Seconds to pause between batches, to leave room for other writes")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        cutoff = timezone.now() - OTP_VALIDITY
+        stale = (
+            OTPVerification.objects
+            .filter(Q(is_used=True) | Q(created_at__lt=cutoff))
+            .order_by('pk')
+            .values_list('pk', flat=True)
+        )
+        purged = 0
+        last_pk = 0
+        while True:
+            # Each batch is its own short transaction, so no lock is held
+            # across the whole purge.
+            batch = list(stale.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            last_pk = batch[-1]
+            purged += OTPVerification.objects.filter(pk__in=batch).delete()[0]
+            if options['sleep']:
+                time.sleep(options['sleep'])
+        self.stdout.write(self.style.SUCCESS(f"Purged {purged} used or expired code(s)."))
@@ -0,0 +1,41 @@
+from django.db import migrations
+
+# Case-insensitive email lookups for accounts.backends.users_with_email.
+# The unique index leaves out users without an email (e.g. from
+# createsuperuser); being partial, the planner cannot use it for a plain
+# LOWER(email) = ... lookup, which gets its own index. Fails if two
+# existing users have emails differing only in case; merge those first.
+INDEXES = [
+    ('accounts_user_email_lower_idx', "CREATE INDEX {concurrently}IF NOT EXISTS {name} ON auth_user (LOWER(email))"),
+    ('accounts_user_email_lower_uniq',
+     "CREATE UNIQUE INDEX {concurrently}IF NOT EXISTS {name} ON auth_user (LOWER(email)) WHERE email <> ''"),
+]
+
+
+def _concurrently(schema_editor):
+    # Builds without blocking logins on PostgreSQL.
+    return 'CONCURRENTLY ' if schema_editor.connection.vendor == 'postgresql' else ''
+
+
+def create_email_indexes(apps, schema_editor):
+    for name, statement in INDEXES:
+        schema_editor.execute(statement.format(concurrently=_concurrently(schema_editor), name=name))
+
+
+def drop_email_indexes(apps, schema_editor):
+    for name, statement in INDEXES:
+        schema_editor.execute(f"DROP INDEX {_concurrently(schema_editor)}IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_email_indexes, drop_email_indexes),
+    ]
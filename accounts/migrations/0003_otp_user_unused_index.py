@@ -0,0 +1,17 @@
+# Generated by Django 4.2.16 on 2026-10-18 16:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_user_email_lower_unique'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='otpverification',
+            index=models.Index(condition=models.Q(('is_used', False)), fields=['user', '-created_at'], name='otp_user_unused_idx'),
+        ),
+    ]
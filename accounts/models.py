@@ -9,6 +9,8 @@ from django.utils import timezone
 from datetime import timedelta
 import hashlib
 
+OTP_VALIDITY = timedelta(minutes=5)
+
 
 class OTPVerification(models.Model):
     """
@@ -22,10 +24,15 @@ class OTPVerification(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # The latest unused code of a user, in one index probe. Partial,
+            # so used codes do not bloat it.
+            models.Index(fields=['user', '-created_at'], condition=models.Q(is_used=False), name='otp_user_unused_idx'),
+        ]
     
     def is_expired(self):
         """Check if OTP is expired (5 minutes validity)"""
-        expiry_time = self.created_at + timedelta(minutes=5)
+        expiry_time = self.created_at + OTP_VALIDITY
         return timezone.now() > expiry_time
     
     def verify_otp(self, otp):
@@ -39,5 +46,12 @@ class OTPVerification(models.Model):
         otp_hash = hashlib.sha256(str(otp).encode()).hexdigest()
         return OTPVerification.objects.create(user=user, otp_hash=otp_hash)
     
+    @staticmethod
+    def latest_valid(user):
+        """The newest unused, unexpired OTP of ``user``, or None"""
+        return OTPVerification.objects.filter(
+            user=user, is_used=False, created_at__gte=timezone.now() - OTP_VALIDITY
+        ).first()
+    
     def __str__(self):
         return f"OTP for {self.user.email} - Created: {self.created_at}"
\ No newline at end of file
@@ -0,0 +1,103 @@
+"""
+Rate limiting for the login and password reset endpoints.
+v1.2 - Sliding-window counters in Django's cache
+
+Each limit counts requests per client IP address or per submitted email
+in fixed windows, and weighs the previous window by how much of it still
+overlaps the sliding window. That needs two cache keys per limit and an
+atomic incr, which locmem, memcached and Redis all provide. Requests over
+a limit are turned away before any form validation, query or password
+hashing runs.
+"""
+
+import hashlib
+import math
+import re
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.shortcuts import render
+
+RATE_RE = re.compile(r'^(\d+)/(\d*)([smhd])$')
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+
+
+def parse_rate(rate):
+    """Turn '10/5m' into (10, 300): ten requests per five minutes"""
+    match = RATE_RE.match(rate)
+    if not match:
+        raise ValueError(f"Invalid rate {rate!r}; expected e.g. '10/m' or '10/5m'.")
+    count, multiplier, unit = match.groups()
+    return int(count), int(multiplier or 1) * PERIODS[unit]
+
+
+def client_ip(request):
+    header = settings.RATE_LIMIT_IP_HEADER
+    value = request.META.get(header, '')
+    if header == 'HTTP_X_FORWARDED_FOR':
+        # The last address is the one our own proxy added; earlier ones
+        # are whatever the client chose to send.
+        value = value.rsplit(',', 1)[-1]
+    return value.strip()
+
+
+def hit(key, limit, window, now=None):
+    """
+    Count one request against ``key`` and return the seconds to wait if
+    that puts it over ``limit`` requests per ``window`` seconds, else 0.
+    """
+    now = time.time() if now is None else now
+    index = int(now // window)
+    current_key = f'{key}:{index}'
+    # Kept for two windows, while it is the previous window of the next.
+    cache.add(current_key, 0, timeout=window * 2)
+    try:
+        current = cache.incr(current_key)
+    except ValueError:
+        # Expired between add and incr.
+        cache.set(current_key, 1, timeout=window * 2)
+        current = 1
+    previous = cache.get(f'{key}:{index - 1}', 0)
+
+    overlap = 1 - (now % window) / window
+    if previous * overlap + current <= limit:
+        return 0
+    return math.ceil(window - now % window)
+
+
+def check_rate_limits(request, scope, email=None):
+    """Count the request against the limits of ``scope`` and return the seconds to wait, or 0"""
+    identities = {'ip': client_ip(request), 'email': (email or '').strip().lower()}
+    retry_after = 0
+    for kind, rate in settings.RATE_LIMITS.get(scope, {}).items():
+        identity = identities.get(kind)
+        if not identity:
+            continue
+        limit, window = parse_rate(rate)
+        digest = hashlib.sha256(identity.encode()).hexdigest()[:32]
+        retry_after = max(retry_after, hit(f'ratelimit:{scope}:{kind}:{digest}', limit, window))
+    return retry_after
+
+
+def post_email(request):
+    return request.POST.get('email')
+
+
+def rate_limit(scope, email=post_email):
+    """
+    Decorator limiting a view to the RATE_LIMITS of ``scope``. ``email``
+    returns the email address a request is for, if any.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            retry_after = check_rate_limits(request, scope, email(request))
+            if retry_after:
+                response = render(request, 'accounts/rate_limited.html', {'retry_after': retry_after}, status=429)
+                response['Retry-After'] = str(retry_after)
+                return response
+            return view(request, *args, **kwargs)
+        return wrapped
+    return decorator
@@ -0,0 +1,33 @@
+from django.contrib.auth.models import User
+from django.contrib.auth.signals import user_logged_out
+from django.core.cache import cache
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .backends import user_cache_key
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_cached_user(sender, instance, **kwargs):
+    cache.delete(user_cache_key(instance.pk))
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def forget_cached_user_permissions(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action.startswith('post_'):
+            cache.delete(user_cache_key(instance.pk))
+    elif action in ('post_add', 'post_remove'):
+        # Changed from the group or permission side.
+        cache.delete_many([user_cache_key(pk) for pk in pk_set])
+    elif action == 'pre_clear':
+        # The users are no longer known once they are cleared.
+        cache.delete_many([user_cache_key(pk) for pk in instance.user_set.values_list('pk', flat=True)])
+
+
+@receiver(user_logged_out)
+def user_logged_out_forget(sender, request, user, **kwargs):
+    if user is not None:
+        cache.delete(user_cache_key(user.pk))
@@ -0,0 +1,189 @@
+import io
+from datetime import timedelta
+from unittest import skipIf
+
+from django.conf import settings
+from django.contrib.auth.models import Permission, User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from .backends import EmailBackend, user_cache_key, users_with_email
+from .models import OTP_VALIDITY, OTPVerification
+from .ratelimit import hit, parse_rate
+
+WINDOW = 60
+# The start of a window, so offsets below are seconds into it.
+START = 1000 * WINDOW
+
+
+class ParseRateTests(SimpleTestCase):
+    def test_rates(self):
+        self.assertEqual(parse_rate('10/m'), (10, 60))
+        self.assertEqual(parse_rate('10/5m'), (10, 300))
+        self.assertEqual(parse_rate('3/h'), (3, 3600))
+
+    def test_invalid(self):
+        for rate in ['10', '10/x', 'ten/m', '/m']:
+            with self.subTest(rate=rate):
+                with self.assertRaises(ValueError):
+                    parse_rate(rate)
+
+
+class HitTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_allows_up_to_limit(self):
+        self.assertEqual([hit('k', 3, WINDOW, now=START + t) for t in (0, 1, 2)], [0, 0, 0])
+
+    def test_over_limit_waits_for_window_end(self):
+        for t in (0, 1, 2):
+            hit('k', 3, WINDOW, now=START + t)
+        self.assertEqual(hit('k', 3, WINDOW, now=START + 10), WINDOW - 10)
+
+    def test_keys_are_separate(self):
+        for t in (0, 1, 2):
+            hit('a', 3, WINDOW, now=START + t)
+        self.assertEqual(hit('b', 3, WINDOW, now=START + 3), 0)
+
+    def test_previous_window_weighed_by_overlap(self):
+        for t in (50, 51, 52, 53):
+            hit('k', 4, WINDOW, now=START + t)
+        # A quarter into the next window, 3 of the previous 4 still count.
+        self.assertEqual(hit('k', 4, WINDOW, now=START + WINDOW + 15), 0)
+        self.assertGreater(hit('k', 4, WINDOW, now=START + WINDOW + 15), 0)
+        # Three quarters in, only 1 does.
+        self.assertEqual(hit('k', 4, WINDOW, now=START + WINDOW + 45), 0)
+
+    def test_counts_expire_after_two_windows(self):
+        for t in (0, 1, 2):
+            hit('k', 3, WINDOW, now=START + t)
+        self.assertEqual(hit('k', 3, WINDOW, now=START + 2 * WINDOW), 0)
+
+
+@override_settings(AUTH_USER_CACHE_TIMEOUT=900)
+class CachedUserTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_user('reader', 'reader@example.com', 'password')
+        self.backend = EmailBackend()
+
+    def test_served_from_cache(self):
+        self.backend.get_user(self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.backend.get_user(self.user.pk), self.user)
+
+    def test_password_change_invalidates(self):
+        cached = self.backend.get_user(self.user.pk)
+        self.user.set_password('changed')
+        self.user.save()
+        user = self.backend.get_user(self.user.pk)
+        self.assertTrue(user.check_password('changed'))
+        self.assertNotEqual(user.get_session_auth_hash(), cached.get_session_auth_hash())
+
+    def test_staff_change_invalidates(self):
+        self.backend.get_user(self.user.pk)
+        self.user.is_staff = True
+        self.user.save()
+        self.assertTrue(self.backend.get_user(self.user.pk).is_staff)
+
+    def test_permission_change_invalidates(self):
+        permission = Permission.objects.get(codename='view_user')
+        changes = [
+            lambda: self.user.user_permissions.add(permission),
+            lambda: permission.user_set.remove(self.user),
+            lambda: permission.user_set.add(self.user),
+            lambda: permission.user_set.clear(),
+        ]
+        for change in changes:
+            self.backend.get_user(self.user.pk)
+            change()
+            self.assertIsNone(cache.get(user_cache_key(self.user.pk)))
+
+    @override_settings(AUTH_USER_CACHE_TIMEOUT=0)
+    def test_disabled(self):
+        for _ in range(2):
+            with self.assertNumQueries(1):
+                self.backend.get_user(self.user.pk)
+        self.assertIsNone(cache.get(user_cache_key(self.user.pk)))
+
+
+class SettingsTests(SimpleTestCase):
+    @skipIf(settings.SHARED_CACHE, "Only applies to a per-process cache")
+    def test_user_cache_disabled_without_shared_cache(self):
+        self.assertEqual(settings.AUTH_USER_CACHE_TIMEOUT, 0)
+        self.assertEqual(settings.SESSION_ENGINE, 'django.contrib.sessions.backends.db')
+
+
+class EmailBackendTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('reader', 'Reader@Example.com', 'password')
+        self.backend = EmailBackend()
+
+    def test_email_matched_case_insensitively(self):
+        self.assertEqual(self.backend.authenticate(None, email='reader@example.COM', password='password'), self.user)
+
+    def test_wrong_password_or_unknown_email(self):
+        self.assertIsNone(self.backend.authenticate(None, email='reader@example.com', password='wrong'))
+        self.assertIsNone(self.backend.authenticate(None, email='nobody@example.com', password='password'))
+
+    def test_inactive_user_rejected(self):
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertIsNone(self.backend.authenticate(None, email='reader@example.com', password='password'))
+
+    def test_username_for_admin_login(self):
+        self.assertEqual(self.backend.authenticate(None, username='reader', password='password'), self.user)
+
+    def test_single_lookup(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(list(users_with_email('READER@example.com')), [self.user])
+
+    def test_emails_unique_ignoring_case(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            User.objects.create_user('other', 'reader@EXAMPLE.com', 'password')
+        # Users without an email are not constrained.
+        User.objects.create_user('first', '', 'password')
+        User.objects.create_user('second', '', 'password')
+
+
+class PurgeOTPsTests(TestCase):
+    def test_used_and_expired_codes_purged(self):
+        user = User.objects.create_user('reader', 'reader@example.com', 'password')
+        valid = OTPVerification.create_otp(user, '123456')
+        used = OTPVerification.create_otp(user, '234567')
+        OTPVerification.objects.filter(pk=used.pk).update(is_used=True)
+        expired = OTPVerification.create_otp(user, '345678')
+        OTPVerification.objects.filter(pk=expired.pk).update(created_at=timezone.now() - OTP_VALIDITY - timedelta(seconds=1))
+
+        output = io.StringIO()
+        call_command('purge_otps', '--batch-size', '1', stdout=output)
+        self.assertEqual(list(OTPVerification.objects.all()), [valid])
+        self.assertIn("Purged 2", output.getvalue())
+        self.assertEqual(OTPVerification.latest_valid(user), valid)
+
+
+class PasswordHasherTests(TestCase):
+    @override_settings(PASSWORD_PBKDF2_ITERATIONS=1000)
+    def test_configured_iterations(self):
+        user = User.objects.create_user('reader', 'reader@example.com', 'password')
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$1000$'))
+
+    def test_rehashed_at_login_when_work_factor_changes(self):
+        with self.settings(PASSWORD_PBKDF2_ITERATIONS=1000):
+            user = User.objects.create_user('reader', 'reader@example.com', 'password')
+        with self.settings(PASSWORD_PBKDF2_ITERATIONS=2000):
+            self.assertEqual(EmailBackend().authenticate(None, email='reader@example.com', password='password'), user)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$2000$'))
+
+    @override_settings(PASSWORD_PBKDF2_ITERATIONS=1000, PASSWORD_HASHERS=['accounts.hashers.PBKDF2PasswordHasher'])
+    def test_calibrate_recommends_setting(self):
+        output = io.StringIO()
+        call_command('calibrate_password_hashers', '--samples', '1', '--target-ms', '1', '--allow-weaker', stdout=output)
+        self.assertRegex(output.getvalue(), r'pbkdf2_sha256 \(preferred\): iterations=1000 takes \d+ ms')
+        self.assertRegex(output.getvalue(), r'\nPASSWORD_PBKDF2_ITERATIONS=\d+\n')
@@ -13,7 +13,9 @@ from .forms import (
     CustomUserCreationForm, LoginForm, ForgotPasswordForm,
     OTPVerificationForm, ResetPasswordForm
 )
+from .backends import users_with_email
 from .models import OTPVerification
+from .ratelimit import rate_limit
 
 @method_decorator([csrf_protect, never_cache], name='dispatch')
 class LoginView(View):
@@ -24,21 +26,18 @@ class LoginView(View):
         form = LoginForm()
         return render(request, 'accounts/login.html', {'form': form})
     
+    @method_decorator(rate_limit('login'))
     def post(self, request):
         form = LoginForm(request.POST)
         if form.is_valid():
             email = form.cleaned_data['email']
             password = form.cleaned_data['password']
             
-            try:
-                user = User.objects.get(email=email)
-                user = authenticate(request, username=user.username, password=password)
-                if user:
-                    login(request, user)
-                    return self.redirect_authenticated_user(user)
-                else:
-                    messages.error(request, 'Invalid email or password.')
-            except User.DoesNotExist:
+            user = authenticate(request, email=email, password=password)
+            if user:
+                login(request, user)
+                return self.redirect_authenticated_user(user)
+            else:
                 messages.error(request, 'Invalid email or password.')
         
         return render(request, 'accounts/login.html', {'form': form})
@@ -73,11 +72,12 @@ class ForgotPasswordView(View):
         form = ForgotPasswordForm()
         return render(request, 'accounts/forgot_password.html', {'form': form})
     
+    @method_decorator(rate_limit('forgot_password'))
     def post(self, request):
         form = ForgotPasswordForm(request.POST)
         if form.is_valid():
             email = form.cleaned_data['email']
-            user = User.objects.get(email=email)
+            user = form.user
             
             otp = ''.join(random.choices(string.digits, k=6))
             OTPVerification.create_otp(user, otp)
@@ -99,6 +99,7 @@ class OTPVerificationView(View):
         form = OTPVerificationForm()
         return render(request, 'accounts/otp_verification.html', {'form': form})
     
+    @method_decorator(rate_limit('otp', email=lambda request: request.session.get('reset_email')))
     def post(self, request):
         if 'reset_email' not in request.session:
             return redirect('accounts:forgot_password')
@@ -109,14 +110,12 @@ class OTPVerificationView(View):
             email = request.session['reset_email']
             
             try:
-                user = User.objects.get(email=email)
-                otp_record = OTPVerification.objects.filter(
-                    user=user, is_used=False
-                ).first()
+                user = users_with_email(email).get()
+                otp_record = OTPVerification.latest_valid(user)
                 
                 if otp_record and otp_record.verify_otp(otp):
                     otp_record.is_used = True
-                    otp_record.save()
+                    otp_record.save(update_fields=['is_used'])
                     
                     request.session['otp_verified'] = True
                     messages.success(request, 'OTP verified successfully.')
@@ -148,7 +147,7 @@ class ResetPasswordView(View):
             password = form.cleaned_data['password1']
             
             try:
-                user = User.objects.get(email=email)
+                user = users_with_email(email).get()
                 user.set_password(password)
                 user.save()
                 
@@ -6,4 +6,5 @@ app_name = 'dashboard'
 urlpatterns = [
     path('user-dashboard/', views.UserDashboardView.as_view(), name='user_dashboard'),
     path('admin-dashboard/', views.AdminDashboardView.as_view(), name='admin_dashboard'),
+    path('card-documents/<int:parent_id>/<int:subcard_id>/', views.card_documents, name='card_documents'),
 ]
\ No newline at end of file
@@ -1,60 +1,84 @@
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
 from django.contrib.admin.views.decorators import staff_member_required
+from django.conf import settings
+from django.http import JsonResponse
+from django.urls import reverse
 from django.utils.decorators import method_decorator
 from django.views import View
-from collections import defaultdict
 
-from documents.models import PDFDocument
+from documents.card_tree import get_card_tree
+from documents.models import CardSettings, PDFDocument
+
+def dashboard_context(is_admin):
+    organized_docs, recent_pdfs, document_count = get_card_tree()
+    card_settings = CardSettings.get_settings()
+    return {
+        'organized_docs': organized_docs,
+        'parent_cards': range(1, card_settings.max_parent_cards + 1),
+        'subcards': range(1, card_settings.max_subcards + 1),
+        'recent_pdfs': recent_pdfs,
+        'document_count': document_count,
+        'is_admin': is_admin,
+    }
 
 @method_decorator(login_required, name='dispatch')
 class UserDashboardView(View):
     def get(self, request):
-        documents = PDFDocument.objects.all().order_by('parent_card_id', 'subcard_id', '-uploaded_at')
-        
-        organized_docs = defaultdict(lambda: defaultdict(list))
-        for doc in documents:
-            organized_docs[doc.parent_card_id][doc.subcard_id].append(doc)
-        
-        organized_docs = dict(organized_docs)
-        for parent_id in organized_docs:
-            organized_docs[parent_id] = dict(organized_docs[parent_id])
-        
-        # Get recent PDFs for display
-        recent_pdfs = PDFDocument.objects.all().order_by('parent_card_id', 'subcard_id','-uploaded_at')
-        
-        context = {
-            'organized_docs': organized_docs,
-            'parent_cards': range(1, 11),
-            'subcards': range(1, 11),
-            'recent_pdfs': recent_pdfs,
-            'is_admin': False,
-        }
-        
+        context = dashboard_context(is_admin=False)
         return render(request, 'dashboard/user_dashboard.html', context)
 
 @method_decorator([login_required, staff_member_required], name='dispatch')
 class AdminDashboardView(View):
     def get(self, request):
-        documents = PDFDocument.objects.all().order_by('parent_card_id', 'subcard_id', '-uploaded_at')
-        
-        organized_docs = defaultdict(lambda: defaultdict(list))
-        for doc in documents:
-            organized_docs[doc.parent_card_id][doc.subcard_id].append(doc)
-        
-        organized_docs = dict(organized_docs)
-        for parent_id in organized_docs:
-            organized_docs[parent_id] = dict(organized_docs[parent_id])
-        
-        # Get recent PDFs for display
-        recent_pdfs = PDFDocument.objects.all().order_by('parent_card_id', 'subcard_id','-uploaded_at')
-        
-        context = {
-            'organized_docs': organized_docs,
-            'parent_cards': range(1, 11),
-            'subcards': range(1, 11),
-            'recent_pdfs': recent_pdfs,
-            'is_admin': True,
-        }
-        
-        return render(request, 'dashboard/admin_dashboard.html', context)
\ No newline at end of file
+        context = dashboard_context(is_admin=True)
+        return render(request, 'dashboard/admin_dashboard.html', context)
+
+@login_required
+def card_documents(request, parent_id, subcard_id):
+    """
+    One page of the documents in a subcard, newest first, as an HTML
+    fragment for the dashboards (or JSON with ?format=json).
+    """
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page = 1
+    page_size = settings.DASHBOARD_CARD_PAGE_SIZE
+    offset = (page - 1) * page_size
+
+    # One extra row tells whether there is a next page without a COUNT.
+    documents = list(
+        PDFDocument.objects
+        .filter(parent_card_id=parent_id, subcard_id=subcard_id)
+        .only('id', 'title', 'uploaded_at', 'sha256')
+        .order_by('-uploaded_at', '-id')[offset:offset + page_size + 1]
+    )
+    next_page = page + 1 if len(documents) > page_size else None
+    documents = documents[:page_size]
+
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'parent_card_id': parent_id,
+            'subcard_id': subcard_id,
+            'page': page,
+            'next_page': next_page,
+            'documents': [
+                {
+                    'id': doc.id,
+                    'title': doc.title,
+                    'uploaded_at': doc.uploaded_at.isoformat(),
+                    'view_url': reverse('documents:view_pdf', args=[doc.id]),
+                    'download_url': reverse('documents:download_pdf', args=[doc.id]),
+                    'thumbnail_url': doc.get_thumbnail_url(),
+                }
+                for doc in documents
+            ],
+        })
+
+    context = {
+        'documents': documents,
+        'next_page': next_page,
+        'is_admin': request.user.is_staff,
+    }
+    return render(request, 'dashboard/card_documents.html', context)
@@ -1,13 +1,73 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.shortcuts import render
+from .forms import MoveDocumentsForm
 from .models import PDFDocument
+from .move import move_documents
+from .trash import restore, soft_delete
+
+class TrashFilter(admin.SimpleListFilter):
+    title = 'trash'
+    parameter_name = 'trash'
+
+    def lookups(self, request, model_admin):
+        return [('live', 'Not deleted'), ('deleted', 'Deleted')]
+
+    def queryset(self, request, queryset):
+        if self.value() == 'live':
+            return queryset.filter(deleted_at__isnull=True)
+        if self.value() == 'deleted':
+            return queryset.filter(deleted_at__isnull=False)
+        return queryset
 
 @admin.register(PDFDocument)
 class PDFDocumentAdmin(admin.ModelAdmin):
-    list_display = ['title', 'parent_card_id', 'subcard_id', 'uploaded_by', 'uploaded_at', 'get_file_size']
-    list_filter = ['parent_card_id', 'subcard_id', 'uploaded_at', 'uploaded_by']
+    list_display = ['title', 'parent_card_id', 'subcard_id', 'uploaded_by', 'uploaded_at', 'get_file_size', 'page_count', 'ingest_status', 'deleted_at']
+    list_filter = [TrashFilter, 'parent_card_id', 'subcard_id', 'uploaded_at', 'uploaded_by', 'ingest_status']
     search_fields = ['title', 'uploaded_by__email']
-    readonly_fields = ['uploaded_at', 'get_file_size']
-    
+    readonly_fields = ['uploaded_at', 'get_file_size', 'page_count', 'sha256', 'pdf_version', 'ingest_status', 'ingest_error', 'ingested_at', 'deleted_at']
+    actions = ['restore_documents', 'move_to_card']
+
+    def get_queryset(self, request):
+        # Deleted documents stay listed so they can be restored.
+        return PDFDocument.all_objects.select_related('uploaded_by')
+
+    # Deleting moves documents to the trash; purge_deleted_documents
+    # removes them for good after the grace period.
+    def delete_model(self, request, obj):
+        soft_delete(PDFDocument.all_objects.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        soft_delete(queryset)
+
+    @admin.action(description='Restore selected documents from the trash')
+    def restore_documents(self, request, queryset):
+        count = restore(queryset)
+        self.message_user(request, f"Restored {count} document(s).", messages.SUCCESS)
+
+    @admin.action(description='Move selected documents to another card')
+    def move_to_card(self, request, queryset):
+        if 'apply' in request.POST:
+            form = MoveDocumentsForm(request.POST)
+            if form.is_valid():
+                count = move_documents(
+                    form.cleaned_data['documents'],
+                    form.cleaned_data['parent_card_id'],
+                    form.cleaned_data['subcard_id'],
+                )
+                self.message_user(request, f"Moved {count} document(s).", messages.SUCCESS)
+                return None
+        else:
+            form = MoveDocumentsForm(initial={'documents': queryset.values_list('pk', flat=True)})
+        return render(request, 'admin/documents/move_documents.html', {
+            **self.admin_site.each_context(request),
+            'title': 'Move documents',
+            'opts': self.model._meta,
+            'form': form,
+            'count': queryset.count(),
+            'selected': request.POST.getlist(helpers.ACTION_CHECKBOX_NAME),
+        })
+
     def get_file_size(self, obj):
         return obj.get_file_size()
-    get_file_size.short_description = 'File Size'
\ No newline at end of file
+    get_file_size.short_description = 'File Size'
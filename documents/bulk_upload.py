@@ -0,0 +1,146 @@
+"""
+Bulk ingest of many PDFs, uploaded as separate files or inside ZIP archives.
+Each file is validated on its own; the accepted ones are written to blob
+storage one at a time and inserted with a single bulk_create.
+"""
+
+import os
+import zipfile
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+
+from .card_tree import mark_cards_changed
+from .ingest import enqueue_ingest
+from .models import PDFDocument
+from .pdf_utils import inspect_pdf
+from .search import index_titles
+from .storage import blob_name, pdf_storage
+
+BulkResult = namedtuple('BulkResult', ['name', 'ok', 'message', 'document'])
+
+PDF_MAGIC = b'%PDF-'
+
+
+def _title_from_filename(filename):
+    stem = os.path.splitext(filename)[0].strip()
+    title = stem if len(stem) >= 3 else filename
+    return title[:200]
+
+
+def _iter_entries(uploads):
+    """
+    Yield (name, size, opener, error) for every file to ingest, expanding
+    ZIP archives. ``opener`` returns a fresh file object each time it is
+    called, so archive members are decompressed on demand and never held
+    in memory. ``error`` is set (and opener None) for unreadable archives.
+    """
+    for upload in uploads:
+        if not upload.name.lower().endswith('.zip'):
+            yield upload.name, upload.size, lambda upload=upload: upload, None
+            continue
+        try:
+            archive = zipfile.ZipFile(upload)
+        except zipfile.BadZipFile:
+            yield upload.name, None, None, "Not a valid ZIP archive."
+            continue
+        for info in archive.infolist():
+            if info.is_dir() or info.filename.startswith('__MACOSX/'):
+                continue
+            name = f'{upload.name}/{info.filename}'
+            yield name, info.file_size, lambda archive=archive, info=info: archive.open(info), None
+
+
+def _validate(name, size, fileobj):
+    if not name.lower().endswith('.pdf'):
+        return "Only PDF files are allowed."
+    max_size = settings.PDF_UPLOAD_MAX_SIZE
+    if size > max_size:
+        return f"File size cannot exceed {max_size // (1024 * 1024)}MB."
+    if fileobj.read(len(PDF_MAGIC)) != PDF_MAGIC:
+        return "File is not a PDF document."
+    return None
+
+
+class _opened:
+    """Context manager around an opener; uploaded files are rewound, not closed"""
+
+    def __init__(self, opener):
+        self.opener = opener
+
+    def __enter__(self):
+        self.fileobj = self.opener()
+        if hasattr(self.fileobj, 'seek'):
+            self.fileobj.seek(0)
+        return self.fileobj
+
+    def __exit__(self, *exc_info):
+        if isinstance(self.fileobj, zipfile.ZipExtFile):
+            self.fileobj.close()
+
+
+def ingest_pdfs(uploads, parent_card_id, subcard_id, user):
+    """
+    Store every PDF in ``uploads`` (UploadedFile objects, ZIP archives
+    expanded) under the given card and return one BulkResult per file.
+    """
+    results = []
+    documents = []
+    written = []
+
+    try:
+        for name, size, opener, error in _iter_entries(uploads):
+            if error:
+                results.append(BulkResult(name, False, error, None))
+                continue
+
+            with _opened(opener) as fileobj:
+                error = _validate(name, size, fileobj)
+                if error is None:
+                    # ZIP members are never read past their declared size.
+                    info = inspect_pdf(fileobj)
+            if error:
+                results.append(BulkResult(name, False, error, None))
+                continue
+
+            stored_name = blob_name(info.sha256)
+            # Touches an existing blob, so no purge unlinks it before the
+            # rows are inserted at the end.
+            if not pdf_storage.reuse(stored_name):
+                with _opened(opener) as fileobj:
+                    pdf_storage.save(stored_name, File(fileobj, name=stored_name))
+                written.append(stored_name)
+
+            filename = os.path.basename(name)
+            document = PDFDocument(
+                title=_title_from_filename(filename),
+                pdf_file=stored_name,
+                original_filename=filename[:255],
+                uploaded_by=user,
+                parent_card_id=parent_card_id,
+                subcard_id=subcard_id,
+                file_size=info.size,
+                sha256=info.sha256,
+                page_count=info.page_count,
+            )
+            documents.append(document)
+            results.append(BulkResult(name, True, "Uploaded", document))
+
+        with transaction.atomic():
+            PDFDocument.objects.bulk_create(documents, batch_size=500)
+            # bulk_create sends no post_save signals.
+            index_titles(documents)
+            enqueue_ingest([document.pk for document in documents])
+    except Exception:
+        # Blobs written by this request are unreferenced if nothing was
+        # inserted, unless a concurrent upload has just reused them.
+        for stored_name in written:
+            if not PDFDocument.all_objects.filter(pdf_file=stored_name).exists():
+                pdf_storage.delete_unused(stored_name)
+        raise
+
+    if documents:
+        mark_cards_changed([(parent_card_id, subcard_id)])
+    return results
@@ -0,0 +1,134 @@
+"""
+Cached snapshot of the dashboard card tree.
+
+The snapshot (document counts per parent card / subcard plus the most
+recent uploads) is stored in Django's cache together with the version it
+was built at. Every change to documents increments the version and records
+which cards it touched, so a stale snapshot only re-counts those cards.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from .models import PDFDocument
+
+VERSION_KEY = 'card_tree:version'
+SNAPSHOT_KEY = 'card_tree:snapshot'
+CHANGE_KEY = 'card_tree:change:{}'
+CHANGE_TIMEOUT = 24 * 60 * 60
+# Beyond this many missed versions a full rebuild is cheaper.
+MAX_INCREMENTAL_CHANGES = 100
+
+# Columns the dashboards display for recent uploads.
+RECENT_FIELDS = [
+    'id', 'title', 'parent_card_id', 'subcard_id', 'uploaded_at',
+    'file_size', 'pdf_file', 'uploaded_by__username',
+]
+
+
+def _initial_version():
+    # Seeded from the clock so the version keeps increasing even if the
+    # cache drops the key.
+    return int(time.time() * 1000)
+
+
+def current_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, _initial_version(), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def mark_cards_changed(cards):
+    """Record that documents in the given (parent_card_id, subcard_id) pairs changed"""
+    cards = sorted({(int(parent_id), int(subcard_id)) for parent_id, subcard_id in cards})
+    if not cards:
+        return
+    try:
+        version = cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, _initial_version(), timeout=None)
+        version = cache.incr(VERSION_KEY)
+    cache.set(CHANGE_KEY.format(version), cards, CHANGE_TIMEOUT)
+
+
+def _count_cards(cards=None):
+    documents = PDFDocument.objects.all()
+    if cards is not None:
+        condition = Q()
+        for parent_id, subcard_id in cards:
+            condition |= Q(parent_card_id=parent_id, subcard_id=subcard_id)
+        documents = documents.filter(condition)
+    rows = (
+        documents
+        .values('parent_card_id', 'subcard_id')
+        .annotate(doc_count=Count('id'))
+        .order_by()
+    )
+    return {(row['parent_card_id'], row['subcard_id']): row['doc_count'] for row in rows}
+
+
+def _recent_pdfs():
+    return list(
+        PDFDocument.objects
+        .select_related('uploaded_by')
+        .only(*RECENT_FIELDS)
+        .order_by('-uploaded_at')[:settings.DASHBOARD_RECENT_PDFS]
+    )
+
+
+def _changed_cards(since, version):
+    """Cards touched after ``since`` up to ``version``, or None if unknown"""
+    if version - since > MAX_INCREMENTAL_CHANGES:
+        return None
+    keys = [CHANGE_KEY.format(v) for v in range(since + 1, version + 1)]
+    changes = cache.get_many(keys)
+    if len(changes) != len(keys):
+        return None
+    return {card for cards in changes.values() for card in cards}
+
+
+def get_snapshot():
+    """
+    Return the current snapshot: a dict with 'version', 'cards' (mapping
+    (parent_card_id, subcard_id) to a document count) and 'recent_pdfs'.
+    """
+    # Read the version before querying, so a change made while rebuilding
+    # leaves the snapshot stale rather than wrongly current.
+    version = current_version()
+    snapshot = cache.get(SNAPSHOT_KEY)
+    if snapshot is not None and snapshot['version'] == version:
+        return snapshot
+
+    changed = None
+    if snapshot is not None and snapshot['version'] < version:
+        changed = _changed_cards(snapshot['version'], version)
+
+    if changed is None:
+        cards = _count_cards()
+    else:
+        cards = dict(snapshot['cards'])
+        for card in changed:
+            cards.pop(card, None)
+        cards.update(_count_cards(changed))
+
+    snapshot = {'version': version, 'cards': cards, 'recent_pdfs': _recent_pdfs()}
+    cache.set(SNAPSHOT_KEY, snapshot, timeout=settings.CARD_TREE_SNAPSHOT_TIMEOUT)
+    return snapshot
+
+
+def get_card_tree():
+    """
+    Return (organized_docs, recent_pdfs, document_count) for the dashboards,
+    where organized_docs maps parent card -> subcard -> document count.
+    """
+    snapshot = get_snapshot()
+    organized_docs = {}
+    for parent_id, subcard_id in sorted(snapshot['cards']):
+        organized_docs.setdefault(parent_id, {})[subcard_id] = snapshot['cards'][(parent_id, subcard_id)]
+    document_count = sum(snapshot['cards'].values())
+    return organized_docs, snapshot['recent_pdfs'], document_count
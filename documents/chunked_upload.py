@@ -0,0 +1,154 @@
+"""
+Resumable uploads of large PDFs sent in parts.
+
+The client creates an UploadSession, then sends the file in consecutive
+parts, each with a Content-Range header giving its offset. Parts are read
+from the request stream in small blocks and appended to a file on disk,
+so memory use does not depend on the file size. After a dropped
+connection the client asks for the session's offset and continues from
+there. Completing the session moves the file into blob storage and
+creates the PDFDocument.
+"""
+
+import os
+import re
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+
+from .models import PDFDocument, UploadSession
+from .pdf_utils import CHUNK_SIZE, inspect_pdf
+from .storage import blob_name, pdf_storage
+
+CONTENT_RANGE_RE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+PDF_MAGIC = b'%PDF-'
+
+
+class UploadError(Exception):
+    """A part or a completion request that cannot be accepted"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class _PartFile(File):
+    # FileSystemStorage moves files that have a temporary_file_path()
+    # instead of copying them.
+    def temporary_file_path(self):
+        return self.name
+
+
+def start_session(user, title, filename, size, parent_card_id, subcard_id):
+    session = UploadSession.objects.create(
+        user=user,
+        title=title,
+        filename=filename,
+        size=size,
+        parent_card_id=parent_card_id,
+        subcard_id=subcard_id,
+    )
+    os.makedirs(settings.PDF_UPLOAD_TEMP_DIR, exist_ok=True)
+    open(session.part_path, 'wb').close()
+    return session
+
+
+def parse_content_range(header, size):
+    """Return (start, end) from a 'bytes start-end/total' header, end exclusive"""
+    match = CONTENT_RANGE_RE.match(header or '')
+    if not match:
+        raise UploadError("A Content-Range header of the form 'bytes start-end/total' is required.")
+    start, last, total = (int(group) for group in match.groups())
+    if total != size or last < start or last >= size:
+        raise UploadError("Content-Range does not match the upload.")
+    return start, last + 1
+
+
+def append_part(session, stream, content_range, content_length):
+    """
+    Write one part read from ``stream`` at the offset given by
+    ``content_range`` and return the new offset. Parts must arrive in
+    order; a part at any other offset is rejected with status 409 so the
+    client can resume from ``session.received``.
+    """
+    start, end = parse_content_range(content_range, session.size)
+    if end - start > settings.PDF_UPLOAD_CHUNK_SIZE:
+        raise UploadError(f"Parts cannot exceed {settings.PDF_UPLOAD_CHUNK_SIZE} bytes.")
+    if content_length != end - start:
+        raise UploadError("Content-Length does not match Content-Range.")
+
+    with transaction.atomic():
+        # The row stays locked until the offset is moved, so concurrent
+        # requests for one session write its part file one at a time.
+        _lock(session)
+        if start != session.received:
+            raise UploadError("Part does not start at the current offset.", status=409)
+
+        remaining = end - start
+        with open(session.part_path, 'r+b') as part:
+            # Drop whatever an interrupted earlier attempt left past the offset.
+            part.seek(start)
+            part.truncate()
+            while remaining:
+                data = stream.read(min(CHUNK_SIZE, remaining))
+                if not data:
+                    break
+                part.write(data)
+                remaining -= len(data)
+        if remaining:
+            # Bytes beyond ``received`` are discarded by the next attempt.
+            raise UploadError("Part ended before its declared length.")
+
+        UploadSession.objects.filter(pk=session.pk).update(received=end, updated_at=timezone.now())
+        session.received = end
+    return end
+
+
+def _lock(session):
+    """Lock ``session``'s row for the current transaction and refresh its offset"""
+    received = (
+        UploadSession.objects.select_for_update()
+        .filter(pk=session.pk)
+        .values_list('received', flat=True)
+        .first()
+    )
+    if received is None:
+        raise UploadError("Upload session no longer exists.", status=404)
+    session.received = received
+
+
+def complete_session(session):
+    """Move the uploaded file into storage and create its PDFDocument"""
+    with transaction.atomic():
+        # Locked so a part still being written, or a second completion
+        # request, waits for this one.
+        _lock(session)
+        if not session.is_complete:
+            raise UploadError("Upload is not complete.", status=409)
+
+        path = session.part_path
+        with open(path, 'rb') as part:
+            if part.read(len(PDF_MAGIC)) != PDF_MAGIC:
+                raise UploadError("File is not a PDF document.")
+            info = inspect_pdf(part)
+
+        # Skips the write when an identical blob is already stored.
+        stored_name = pdf_storage.save(blob_name(info.sha256), _PartFile(None, name=path))
+
+        document = PDFDocument.objects.create(
+            title=session.title,
+            pdf_file=stored_name,
+            original_filename=session.filename,
+            uploaded_by=session.user,
+            parent_card_id=session.parent_card_id,
+            subcard_id=session.subcard_id,
+            file_size=info.size,
+            sha256=info.sha256,
+            page_count=info.page_count,
+        )
+        # Also removes the part file when an identical blob already existed.
+        session.delete()
+    return document
@@ -0,0 +1,218 @@
+"""
+Helpers for sending stored PDFs to the client.
+Files are streamed from disk (or handed off to the web server) instead of
+being read into worker memory, with support for byte ranges and
+conditional requests.
+"""
+
+import os
+import uuid
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe
+
+DELIVERY_STREAM = 'stream'
+DELIVERY_X_ACCEL_REDIRECT = 'x-accel-redirect'
+DELIVERY_X_SENDFILE = 'x-sendfile'
+
+# Requests asking for more ranges than this get the whole file instead.
+MAX_RANGES = 16
+
+
+def pdf_response(request, document, as_attachment=False):
+    """Build the response that delivers ``document``'s PDF to the client"""
+    path = document.pdf_file.path
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        raise Http404("PDF file not found")
+
+    etag = _etag(document, stat)
+    last_modified = int(document.uploaded_at.timestamp())
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = _file_response(request, document, path, stat.st_size, etag, last_modified, as_attachment)
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+def _etag(document, stat):
+    if document.sha256:
+        return f'"{document.sha256}"'
+    return f'"{document.pk:x}-{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def _file_response(request, document, path, size, etag, last_modified, as_attachment):
+    filename = document.get_filename()
+    mode = getattr(settings, 'PDF_DELIVERY_MODE', DELIVERY_STREAM)
+
+    if mode in (DELIVERY_X_ACCEL_REDIRECT, DELIVERY_X_SENDFILE):
+        # The web server sends the bytes (and handles Range itself);
+        # Django has only checked permissions and validators.
+        response = HttpResponse(content_type='application/pdf')
+        if mode == DELIVERY_X_ACCEL_REDIRECT:
+            prefix = settings.PDF_ACCEL_REDIRECT_PREFIX.rstrip('/')
+            response['X-Accel-Redirect'] = quote(f'{prefix}/{document.pdf_file.name}')
+        else:
+            response['X-Sendfile'] = path
+        response['Content-Disposition'] = content_disposition_header(as_attachment, filename)
+        return response
+
+    ranges = None
+    if request.method in ('GET', 'HEAD') and _if_range_matches(request, etag, last_modified):
+        ranges = parse_range_header(request.headers.get('Range'), size)
+
+    if ranges == []:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    try:
+        pdf_file = open(path, 'rb')
+    except FileNotFoundError:
+        raise Http404("PDF file not found")
+
+    if ranges:
+        response = _range_response(pdf_file, ranges, size)
+        response['Content-Disposition'] = content_disposition_header(as_attachment, filename)
+    else:
+        # FileResponse hands the open file to wsgi.file_wrapper when the
+        # server provides one (sendfile); otherwise it is read in chunks.
+        response = FileResponse(
+            pdf_file,
+            content_type='application/pdf',
+            as_attachment=as_attachment,
+            filename=filename,
+        )
+        response.block_size = settings.PDF_STREAM_CHUNK_SIZE
+
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def _if_range_matches(request, etag, last_modified):
+    """A Range request is only honoured if If-Range (when sent) still matches"""
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if if_range.startswith('"'):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+def parse_range_header(header, size):
+    """
+    Parse a ``Range: bytes=...`` header into a sorted list of inclusive
+    (start, end) pairs with overlapping ranges merged.
+    Returns None when the header should be ignored (absent, malformed or
+    too many ranges) and [] when no range is satisfiable.
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition('=')
+    if unit.strip().lower() != 'bytes' or not spec:
+        return None
+
+    ranges = []
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        start, sep, end = part.partition('-')
+        if not sep:
+            return None
+        try:
+            if not start:
+                # Suffix range: the last N bytes.
+                length = int(end)
+                if length <= 0:
+                    continue
+                start, end = max(size - length, 0), size - 1
+            else:
+                start = int(start)
+                end = int(end) if end else None
+        except ValueError:
+            return None
+        if start < 0 or (end is not None and start > end):
+            return None
+        if start >= size:
+            continue
+        if end is None:
+            end = size - 1
+        ranges.append((start, min(end, size - 1)))
+
+    if len(ranges) > MAX_RANGES:
+        return None
+
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _read_range(pdf_file, start, end):
+    chunk_size = settings.PDF_STREAM_CHUNK_SIZE
+    pdf_file.seek(start)
+    remaining = end - start + 1
+    while remaining > 0:
+        data = pdf_file.read(min(chunk_size, remaining))
+        if not data:
+            break
+        remaining -= len(data)
+        yield data
+
+
+def _range_response(pdf_file, ranges, size):
+    if len(ranges) == 1:
+        start, end = ranges[0]
+
+        def content():
+            try:
+                yield from _read_range(pdf_file, start, end)
+            finally:
+                pdf_file.close()
+
+        response = StreamingHttpResponse(content(), status=206, content_type='application/pdf')
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(end - start + 1)
+        return response
+
+    boundary = uuid.uuid4().hex
+    part_headers = [
+        (
+            f'--{boundary}\r\n'
+            f'Content-Type: application/pdf\r\n'
+            f'Content-Range: bytes {start}-{end}/{size}\r\n\r\n'
+        ).encode('ascii')
+        for start, end in ranges
+    ]
+    closing = f'\r\n--{boundary}--\r\n'.encode('ascii')
+    length = sum(len(h) + (end - start + 1) + 2 for h, (start, end) in zip(part_headers, ranges))
+    # The first part header is not preceded by a CRLF.
+    length += len(closing) - 2
+
+    def content():
+        try:
+            for index, (header, (start, end)) in enumerate(zip(part_headers, ranges)):
+                yield header if index == 0 else b'\r\n' + header
+                yield from _read_range(pdf_file, start, end)
+            yield closing
+        finally:
+            pdf_file.close()
+
+    response = StreamingHttpResponse(
+        content(),
+        status=206,
+        content_type=f'multipart/byteranges; boundary={boundary}',
+    )
+    response['Content-Length'] = str(length)
+    return response
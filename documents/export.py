@@ -0,0 +1,109 @@
+"""
+ZIP archives of the documents in a card, streamed while they are built.
+
+Entries are stored uncompressed (PDFs rarely shrink further) and written
+with data descriptors, so the archive never needs to be seeked and bytes
+go out as soon as each block is read from disk. Memory use is one block
+plus one chunk of rows, however many documents the card holds; ZIP64
+records are written where sizes or counts need them.
+"""
+
+import os
+import zipfile
+
+from django.utils import timezone
+
+from .models import PDFDocument
+from .storage import pdf_storage
+
+BLOCK_SIZE = 1024 * 1024
+ROW_CHUNK_SIZE = 500
+
+# ZIP timestamps cannot predate 1980.
+MIN_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+
+class _Buffer:
+    """Write-only stream that collects what zipfile writes until it is drained"""
+
+    def __init__(self):
+        self.parts = []
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.parts)
+        self.parts = []
+        return data
+
+
+def card_documents(parent_card_id, subcard_id=None):
+    documents = PDFDocument.objects.filter(parent_card_id=parent_card_id)
+    if subcard_id is not None:
+        documents = documents.filter(subcard_id=subcard_id)
+    return (
+        documents
+        .order_by('subcard_id', 'pk')
+        .only('pk', 'subcard_id', 'pdf_file', 'original_filename', 'uploaded_at')
+        .iterator(chunk_size=ROW_CHUNK_SIZE)
+    )
+
+
+def archive_name(document, include_subcard):
+    # The id keeps names unique when several uploads share a filename.
+    name = f'{document.pk}-{document.get_filename()}'
+    if include_subcard:
+        name = f'subcard_{document.subcard_id}/{name}'
+    return name
+
+
+def stream_card_archive(parent_card_id, subcard_id=None):
+    """Yield the bytes of a ZIP of the card's documents, block by block"""
+    entries = (
+        (archive_name(document, subcard_id is None), pdf_storage.path(document.pdf_file.name), document.uploaded_at)
+        for document in card_documents(parent_card_id, subcard_id)
+    )
+    return stream_zip(entries)
+
+
+def stream_zip(entries):
+    """
+    Yield a ZIP archive of ``entries``, (archive name, path, datetime)
+    tuples, as it is written. Files that have disappeared are left out.
+    """
+    return (data for data in _write_zip(entries) if data)
+
+
+def _write_zip(entries):
+    buffer = _Buffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+        for name, path, modified in entries:
+            try:
+                source = open(path, 'rb')
+            except FileNotFoundError:
+                continue
+            with source:
+                info = zipfile.ZipInfo(name, date_time=_date_time(modified))
+                info.compress_type = zipfile.ZIP_STORED
+                # Lets zipfile decide up front whether the entry needs ZIP64.
+                info.file_size = os.fstat(source.fileno()).st_size
+                with archive.open(info, 'w') as target:
+                    while True:
+                        block = source.read(BLOCK_SIZE)
+                        if not block:
+                            break
+                        target.write(block)
+                        yield buffer.drain()
+            yield buffer.drain()
+    # The central directory.
+    yield buffer.drain()
+
+
+def _date_time(value):
+    # ZIP timestamps have no time zone; local time is what archivers show.
+    return max(timezone.localtime(value).timetuple()[:6], MIN_DATE_TIME)
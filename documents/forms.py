@@ -1,5 +1,27 @@
+import os
 from django import forms
-from .models import PDFDocument, CardSettings
+from django.conf import settings as django_settings
+from django.urls import reverse_lazy
+from .models import PDFDocument, CardSettings, UploadSession
+
+class MultipleFileInput(forms.ClearableFileInput):
+    allow_multiple_selected = True
+
+class MultipleFileField(forms.FileField):
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('widget', MultipleFileInput())
+        super().__init__(*args, **kwargs)
+    
+    def clean(self, data, initial=None):
+        single_clean = super().clean
+        if isinstance(data, (list, tuple)):
+            return [single_clean(item, initial) for item in data]
+        return [single_clean(data, initial)]
+
+def card_choices(settings):
+    parent_choices = [(i, f'Parent Card {i}') for i in range(1, settings.max_parent_cards + 1)]
+    subcard_choices = [(i, f'Subcard {i}') for i in range(1, settings.max_subcards + 1)]
+    return parent_choices, subcard_choices
 
 class PDFUploadForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
@@ -7,8 +29,7 @@ class PDFUploadForm(forms.ModelForm):
         settings = CardSettings.get_settings()
         
         # Dynamic choices based on settings
-        parent_choices = [(i, f'Parent Card {i}') for i in range(1, settings.max_parent_cards + 1)]
-        subcard_choices = [(i, f'Subcard {i}') for i in range(1, settings.max_subcards + 1)]
+        parent_choices, subcard_choices = card_choices(settings)
         
         self.fields['parent_card_id'].widget = forms.Select(choices=parent_choices, attrs={'class': 'form-control'})
         self.fields['subcard_id'].widget = forms.Select(choices=subcard_choices, attrs={'class': 'form-control'})
@@ -19,7 +40,10 @@ class PDFUploadForm(forms.ModelForm):
         widgets = {
             'title': forms.TextInput(attrs={
                 'class': 'form-control',
-                'placeholder': 'Enter document title'
+                'placeholder': 'Enter document title',
+                'autocomplete': 'off',
+                'data-autocomplete-url': reverse_lazy('documents:autocomplete'),
+                'data-autocomplete-min-length': django_settings.AUTOCOMPLETE_MIN_LENGTH,
             }),
             'pdf_file': forms.FileInput(attrs={
                 'class': 'form-control',
@@ -34,8 +58,9 @@ class PDFUploadForm(forms.ModelForm):
             if not pdf_file.name.lower().endswith('.pdf'):
                 raise forms.ValidationError("Only PDF files are allowed.")
             
-            if pdf_file.size > 10 * 1024 * 1024:
-                raise forms.ValidationError("File size cannot exceed 10MB.")
+            max_size = django_settings.PDF_UPLOAD_MAX_SIZE
+            if pdf_file.size > max_size:
+                raise forms.ValidationError(f"File size cannot exceed {max_size // (1024 * 1024)}MB.")
         
         return pdf_file
     
@@ -45,6 +70,81 @@ class PDFUploadForm(forms.ModelForm):
             raise forms.ValidationError("Title must be at least 3 characters long.")
         return title.strip()
 
+class BulkPDFUploadForm(forms.Form):
+    files = MultipleFileField(
+        widget=MultipleFileInput(attrs={
+            'class': 'form-control',
+            'accept': '.pdf,.zip'
+        }),
+        help_text="Select several PDF files, or ZIP archives of PDFs"
+    )
+    parent_card_id = forms.TypedChoiceField(coerce=int)
+    subcard_id = forms.TypedChoiceField(coerce=int)
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        parent_choices, subcard_choices = card_choices(CardSettings.get_settings())
+        self.fields['parent_card_id'].choices = parent_choices
+        self.fields['parent_card_id'].widget.attrs['class'] = 'form-control'
+        self.fields['subcard_id'].choices = subcard_choices
+        self.fields['subcard_id'].widget.attrs['class'] = 'form-control'
+    
+    def clean_files(self):
+        files = self.cleaned_data.get('files')
+        max_files = django_settings.PDF_BULK_UPLOAD_MAX_FILES
+        if len(files) > max_files:
+            raise forms.ValidationError(f"At most {max_files} files can be uploaded at once.")
+        return files
+
+class ChunkedUploadForm(forms.ModelForm):
+    parent_card_id = forms.TypedChoiceField(coerce=int)
+    subcard_id = forms.TypedChoiceField(coerce=int)
+    
+    class Meta:
+        model = UploadSession
+        fields = ['title', 'filename', 'size', 'parent_card_id', 'subcard_id']
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        parent_choices, subcard_choices = card_choices(CardSettings.get_settings())
+        self.fields['parent_card_id'].choices = parent_choices
+        self.fields['subcard_id'].choices = subcard_choices
+    
+    def clean_filename(self):
+        filename = os.path.basename(self.cleaned_data.get('filename'))
+        if not filename.lower().endswith('.pdf'):
+            raise forms.ValidationError("Only PDF files are allowed.")
+        return filename
+    
+    def clean_size(self):
+        size = self.cleaned_data.get('size')
+        max_size = django_settings.PDF_CHUNKED_UPLOAD_MAX_SIZE
+        if size == 0:
+            raise forms.ValidationError("The file is empty.")
+        if size > max_size:
+            raise forms.ValidationError(f"File size cannot exceed {max_size // (1024 * 1024)}MB.")
+        return size
+    
+    def clean_title(self):
+        title = self.cleaned_data.get('title')
+        if len(title.strip()) < 3:
+            raise forms.ValidationError("Title must be at least 3 characters long.")
+        return title.strip()
+
+class MoveDocumentsForm(forms.Form):
+    documents = forms.ModelMultipleChoiceField(
+        queryset=PDFDocument.all_objects.all(),
+        widget=forms.MultipleHiddenInput,
+    )
+    parent_card_id = forms.TypedChoiceField(coerce=int, widget=forms.Select(attrs={'class': 'form-control'}))
+    subcard_id = forms.TypedChoiceField(coerce=int, widget=forms.Select(attrs={'class': 'form-control'}))
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        parent_choices, subcard_choices = card_choices(CardSettings.get_settings())
+        self.fields['parent_card_id'].choices = parent_choices
+        self.fields['subcard_id'].choices = subcard_choices
+
 class CardSettingsForm(forms.ModelForm):
     class Meta:
         model = CardSettings
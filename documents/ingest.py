@@ -0,0 +1,190 @@
+"""
+Database-backed queue for checking uploaded PDFs in the background.
+
+Uploads only store the file and enqueue an IngestJob. The
+process_ingest_queue command claims jobs in batches, parses the files and
+extracts their text in a pool of worker processes (rendering thumbnails
+on the way) and writes the results back once per batch.
+"""
+
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import (
+    INGEST_CORRUPT, INGEST_MISSING, INGEST_PENDING, INGEST_VALID,
+    IngestJob, PDFDocument, PDFText,
+)
+from .pdf_text import extract_text
+from .pdf_utils import PDFTimeLimitExceeded, open_pdf, time_limit
+from .storage import pdf_storage
+from .thumbnails import get_thumbnail
+
+RESULT_FIELDS = ['page_count', 'pdf_version', 'ingest_status', 'ingest_error', 'ingested_at']
+
+IngestResult = namedtuple(
+    'IngestResult', ['job_id', 'document_id', 'path', 'status', 'page_count', 'version', 'error', 'text']
+)
+
+
+def enqueue_ingest(document_ids):
+    """Queue the given documents; documents already queued are left alone"""
+    IngestJob.objects.bulk_create(
+        [IngestJob(document_id=document_id) for document_id in document_ids],
+        ignore_conflicts=True,
+    )
+
+
+def claim_jobs(batch_size, lease, max_attempts):
+    """
+    Claim up to ``batch_size`` jobs that are unclaimed or whose claim has
+    expired, and return them as (job_id, document_id, path, sha256) tuples.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        # skip_locked lets several queue processes claim disjoint batches.
+        job_ids = list(
+            IngestJob.objects
+            .filter(Q(claimed_at__isnull=True) | Q(claimed_at__lt=now - timedelta(seconds=lease)))
+            .filter(attempts__lt=max_attempts)
+            .order_by('pk')
+            .select_for_update(skip_locked=True)
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        IngestJob.objects.filter(pk__in=job_ids).update(claimed_at=now, attempts=F('attempts') + 1)
+
+    jobs = (
+        IngestJob.objects
+        .filter(pk__in=job_ids)
+        .order_by('pk')
+        .values_list('pk', 'document_id', 'document__pdf_file', 'document__sha256')
+    )
+    return [
+        (job_id, document_id, pdf_storage.path(name), sha256)
+        for job_id, document_id, name, sha256 in jobs
+    ]
+
+
+def parse_job(job):
+    """
+    Run in a worker process: parse one claimed file and extract its text.
+    Touches no database connection, so it is safe to run in forked workers.
+    Never raises: an exception would abort the whole batch in pool.map, so
+    a file that breaks the parser is recorded as corrupt on its own.
+    """
+    job_id, document_id, path, sha256 = job
+    try:
+        with time_limit(settings.PDF_PARSE_TIME_LIMIT), open_pdf(path) as (structure, reader):
+            text = None
+            if reader is not None:
+                text = _extract_text(reader)
+    except FileNotFoundError:
+        return IngestResult(job_id, document_id, path, INGEST_MISSING, None, '', "File not found.", None)
+    except (Exception, PDFTimeLimitExceeded) as error:
+        message = str(error) or type(error).__name__
+        return IngestResult(job_id, document_id, path, INGEST_CORRUPT, None, '', message[:255], None)
+    if structure.error:
+        return IngestResult(job_id, document_id, path, INGEST_CORRUPT, structure.page_count,
+                            structure.version or '', structure.error, None)
+
+    if sha256 and settings.THUMBNAIL_RENDER_ON_INGEST:
+        try:
+            get_thumbnail(sha256, path)
+        except Exception:
+            # Rendered on first request instead.
+            pass
+    return IngestResult(job_id, document_id, path, INGEST_VALID, structure.page_count, structure.version, '',
+                        text or '')
+
+
+def _extract_text(reader):
+    try:
+        return extract_text(reader, settings.SEARCH_MAX_TEXT_LENGTH)
+    except (Exception, PDFTimeLimitExceeded):
+        # The file itself is sound; it stays findable by title.
+        return ''
+
+
+def record_results(results):
+    """
+    Write parse results and extracted text back and remove the finished
+    jobs. A result for a file that was replaced while it was being parsed
+    is dropped and its job handed out again, to parse the new file.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        # Locked so the file cannot be replaced between the check and the write.
+        current = {
+            pk: (pdf_storage.path(name), title)
+            for pk, name, title in PDFDocument.all_objects
+            .select_for_update()
+            .filter(pk__in=[result.document_id for result in results])
+            .values_list('pk', 'pdf_file', 'title')
+        }
+        stale_jobs = [
+            result.job_id for result in results
+            if result.document_id in current and current[result.document_id][0] != result.path
+        ]
+        results = [result for result in results if result.document_id in current and result.job_id not in stale_jobs]
+        documents = [
+            PDFDocument(
+                pk=result.document_id,
+                ingest_status=result.status,
+                page_count=result.page_count,
+                pdf_version=result.version,
+                ingest_error=result.error,
+                ingested_at=now,
+            )
+            for result in results
+        ]
+        PDFDocument.all_objects.bulk_update(documents, RESULT_FIELDS)
+        PDFText.objects.bulk_create(
+            [
+                PDFText(document_id=result.document_id, title=current[result.document_id][1],
+                        content=result.text, extracted_at=now)
+                for result in results
+                if result.text is not None
+            ],
+            update_conflicts=True,
+            unique_fields=['document'],
+            update_fields=['title', 'content', 'extracted_at'],
+        )
+        IngestJob.objects.filter(pk__in=[result.job_id for result in results]).delete()
+        IngestJob.objects.filter(pk__in=stale_jobs).update(claimed_at=None, attempts=0)
+
+
+def fail_exhausted_jobs(max_attempts):
+    """Mark documents whose job kept failing as corrupt and drop the jobs"""
+    exhausted = IngestJob.objects.filter(attempts__gte=max_attempts)
+    with transaction.atomic():
+        count = PDFDocument.all_objects.filter(ingest_job__in=exhausted).update(
+            ingest_status=INGEST_CORRUPT,
+            ingest_error="Could not be processed.",
+            ingested_at=timezone.now(),
+        )
+        exhausted.delete()
+    return count
+
+
+def enqueue_pending(batch_size=1000):
+    """Queue pending documents that have no job, e.g. rows created before the queue existed"""
+    return enqueue_all(PDFDocument.objects.filter(ingest_status=INGEST_PENDING), batch_size)
+
+
+def enqueue_all(documents, batch_size=1000):
+    """Queue every document in the ``documents`` queryset that has no job yet"""
+    ids = documents.filter(ingest_job__isnull=True).order_by('pk').values_list('pk', flat=True)
+    queued = 0
+    last_pk = 0
+    while True:
+        batch = list(ids.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            break
+        last_pk = batch[-1]
+        enqueue_ingest(batch)
+        queued += len(batch)
+    return queued
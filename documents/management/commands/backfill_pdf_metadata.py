@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from documents.models import PDFDocument
+
+
+class Command(BaseCommand):
+    help = ("Store file size and SHA-256 for PDF documents uploaded before they were recorded; "
+            "page counts come from process_ingest_queue")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help="Number of rows read and updated per batch")
+        parser.add_argument('--all', action='store_true',
+                            help="Recompute metadata for every document, not only missing ones")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        documents = PDFDocument.all_objects.order_by('pk').only('pk', 'pdf_file')
+        if not options['all']:
+            documents = documents.filter(Q(file_size__isnull=True) | Q(sha256=''))
+
+        updated = missing = 0
+        last_pk = 0
+        while True:
+            batch = list(documents.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+
+            changed = []
+            for document in batch:
+                try:
+                    with document.pdf_file.open('rb') as pdf_file:
+                        document.set_file_metadata(pdf_file)
+                except (FileNotFoundError, ValueError):
+                    missing += 1
+                    self.stderr.write(f"Missing file for document {document.pk}: {document.pdf_file.name}")
+                    continue
+                changed.append(document)
+
+            PDFDocument.all_objects.bulk_update(changed, ['file_size', 'sha256'])
+            updated += len(changed)
+            self.stdout.write(f"Updated {updated} document(s)...")
+
+        self.stdout.write(self.style.SUCCESS(f"Backfilled {updated} document(s); {missing} file(s) missing."))
@@ -0,0 +1,71 @@
+from django.core.management.base import BaseCommand
+
+from documents.models import PDFDocument
+from documents.storage import BLOB_PREFIX, blob_name
+
+
+class Command(BaseCommand):
+    help = ("Move PDFs stored under per-card paths into the content-addressed blob store, "
+            "so documents with identical files share one copy on disk")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help="Number of rows read and updated per batch")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Report what would be moved without touching files or rows")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
+        storage = PDFDocument._meta.get_field('pdf_file').storage
+
+        pending = PDFDocument.all_objects.exclude(pdf_file__startswith=BLOB_PREFIX)
+        unhashed = pending.filter(sha256='').count()
+        if unhashed:
+            self.stderr.write(f"{unhashed} document(s) have no checksum yet; run backfill_pdf_metadata first.")
+
+        documents = pending.exclude(sha256='').order_by('pk').only('pk', 'pdf_file', 'sha256', 'file_size')
+        moved = removed = freed = 0
+        last_pk = 0
+        while True:
+            batch = list(documents.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+
+            changed = []
+            old_names = {}
+            for document in batch:
+                old_name = document.pdf_file.name
+                new_name = blob_name(document.sha256)
+                if dry_run:
+                    changed.append(document)
+                    continue
+                if not storage.reuse(new_name):
+                    try:
+                        with storage.open(old_name, 'rb') as pdf_file:
+                            storage.save(new_name, pdf_file)
+                    except FileNotFoundError:
+                        self.stderr.write(f"Missing file for document {document.pk}: {old_name}")
+                        continue
+                document.pdf_file.name = new_name
+                old_names[old_name] = document.file_size or 0
+                changed.append(document)
+
+            moved += len(changed)
+            if dry_run:
+                continue
+
+            PDFDocument.all_objects.bulk_update(changed, ['pdf_file'])
+            for old_name, size in old_names.items():
+                if not PDFDocument.all_objects.filter(pdf_file=old_name).exists():
+                    storage.delete(old_name)
+                    removed += 1
+                    freed += size
+
+        if dry_run:
+            self.stdout.write(f"Would move {moved} document(s) into the blob store.")
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"Moved {moved} document(s); removed {removed} old file(s), {freed / (1024 * 1024):.1f} MB."
+        ))
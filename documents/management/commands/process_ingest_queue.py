@@ -0,0 +1,63 @@
+import multiprocessing
+import os
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from documents.ingest import (
+    claim_jobs, enqueue_all, enqueue_pending, fail_exhausted_jobs, parse_job, record_results,
+)
+from documents.models import PDFDocument
+
+
+class Command(BaseCommand):
+    help = ("Check queued PDF documents in a pool of worker processes and record their "
+            "page count, PDF version, search text and whether the file is valid or corrupt")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help="Number of worker processes parsing files")
+        parser.add_argument('--batch-size', type=int, default=100,
+                            help="Number of jobs claimed and written back per batch")
+        parser.add_argument('--lease', type=int, default=600,
+                            help="Seconds after which a claimed job is handed out again")
+        parser.add_argument('--max-attempts', type=int, default=3,
+                            help="Attempts before a document is marked corrupt")
+        parser.add_argument('--loop', action='store_true',
+                            help="Keep polling for new jobs instead of exiting when the queue is empty")
+        parser.add_argument('--poll-interval', type=float, default=5.0,
+                            help="Seconds to wait between polls of an empty queue with --loop")
+        parser.add_argument('--enqueue-pending', action='store_true',
+                            help="First queue pending documents that have no job (e.g. uploaded before the queue existed)")
+        parser.add_argument('--reindex', action='store_true',
+                            help="First queue every document, to refresh page counts, search text and thumbnails")
+
+    def handle(self, *args, **options):
+        if options['enqueue_pending']:
+            self.stdout.write(f"Queued {enqueue_pending()} pending document(s).")
+        if options['reindex']:
+            self.stdout.write(f"Queued {enqueue_all(PDFDocument.objects.all())} document(s).")
+
+        # Forked workers must not share the parent's database connections.
+        connections.close_all()
+        processed = 0
+        with multiprocessing.Pool(processes=options['workers']) as pool:
+            while True:
+                failed = fail_exhausted_jobs(options['max_attempts'])
+                if failed:
+                    self.stderr.write(f"Gave up on {failed} document(s).")
+
+                jobs = claim_jobs(options['batch_size'], options['lease'], options['max_attempts'])
+                if not jobs:
+                    if not options['loop']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                results = pool.map(parse_job, jobs, chunksize=max(len(jobs) // (options['workers'] * 4), 1))
+                record_results(results)
+                processed += len(results)
+                self.stdout.write(f"Processed {processed} document(s)...")
+
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} document(s)."))
@@ -0,0 +1,25 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from documents.trash import purge_deleted
+
+
+class Command(BaseCommand):
+    help = "Permanently remove documents deleted longer ago than the grace period, and their unused files"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-period', type=int, default=settings.PDF_DELETE_GRACE_PERIOD,
+                            help="Seconds a deleted document stays restorable")
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help="Number of documents removed per batch")
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(seconds=options['grace_period'])
+        purged, removed, failed = purge_deleted(cutoff, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Purged {purged} document(s) and removed {removed} file(s)."))
+        if failed:
+            self.stderr.write(f"{failed} file(s) were kept, being recently reused or not removable; "
+                              "reconcile_media removes them once unused.")
@@ -0,0 +1,23 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from documents.models import UploadSession
+
+
+class Command(BaseCommand):
+    help = "Delete chunked uploads that have not received a part for a while, along with their temporary files"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-age', type=int, default=settings.PDF_UPLOAD_SESSION_MAX_AGE,
+                            help="Seconds since the last part after which an upload is abandoned")
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(seconds=options['max_age'])
+        purged = 0
+        for session in UploadSession.objects.filter(updated_at__lt=cutoff).iterator():
+            session.delete()
+            purged += 1
+        self.stdout.write(self.style.SUCCESS(f"Purged {purged} abandoned upload(s)."))
@@ -0,0 +1,137 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import F
+from django.db.models.functions import Collate
+
+from documents.models import PDFDocument
+from documents.storage import BLOB_PREFIX, LEGACY_PREFIX, pdf_storage
+
+
+class Command(BaseCommand):
+    help = ("Compare the PDF files under MEDIA_ROOT with the documents referencing them, "
+            "reporting or deleting files no document uses and reporting documents whose file is missing")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--delete', action='store_true',
+                            help="Delete orphaned files instead of only reporting them")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="With --delete, report what would be deleted without touching files")
+        parser.add_argument('--min-age', type=int, default=3600,
+                            help="Seconds a file must be unmodified to count as orphaned, "
+                                 "so uploads still being saved are left alone")
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="Rows fetched per query and files unlinked per batch")
+
+    def handle(self, *args, **options):
+        self.delete = options['delete'] and not options['dry_run']
+        self.batch_size = options['batch_size']
+        self.cutoff = time.time() - options['min_age']
+        self.verbosity = options['verbosity']
+        self.pending = []
+        self.orphaned = self.orphaned_size = self.deleted = self.missing = self.files = 0
+
+        # Both sides are streamed in the same order and merged, so neither
+        # the tree nor the table is ever held in memory.
+        for prefix in (BLOB_PREFIX, LEGACY_PREFIX):
+            self.reconcile(prefix)
+        self.flush()
+
+        action = "Deleted" if self.delete else "Found"
+        self.stdout.write(self.style.SUCCESS(
+            f"Scanned {self.files} file(s). {action} {self.deleted if self.delete else self.orphaned} orphaned "
+            f"file(s), {self.orphaned_size / (1024 * 1024):.1f} MB; {self.missing} document(s) missing their file."
+        ))
+
+    def reconcile(self, prefix):
+        files = self.walk(pdf_storage.location, prefix)
+        rows = self.stored_names(prefix)
+        file = next(files, None)
+        row = next(rows, None)
+        while file is not None or row is not None:
+            if file is None or (row is not None and row[0] < file[0]):
+                self.report_missing(*row)
+                row = self.next_name(rows, row[0])
+            elif row is None or file[0] < row[0]:
+                self.check_orphan(*file)
+                file = next(files, None)
+            else:
+                file = next(files, None)
+                row = self.next_name(rows, row[0])
+
+    def walk(self, root, relative):
+        """
+        Yield (name, DirEntry) for the files below ``relative``, ordered by
+        name as plain strings. Only one directory listing is held at a time.
+        """
+        try:
+            with os.scandir(os.path.join(root, relative)) as iterator:
+                # Directories sort as "name/", which keeps the depth-first
+                # walk in the same order as the full names.
+                entries = [
+                    (entry.name + '/' if entry.is_dir(follow_symlinks=False) else entry.name, entry)
+                    for entry in iterator
+                ]
+        except FileNotFoundError:
+            return
+        entries.sort(key=lambda item: item[0])
+        for key, entry in entries:
+            if key.endswith('/'):
+                yield from self.walk(root, relative + key)
+            elif entry.is_file(follow_symlinks=False):
+                self.files += 1
+                yield relative + key, entry
+
+    def stored_names(self, prefix):
+        """Yield (name, document id) for the stored files under ``prefix``, ordered by name"""
+        # Byte order, to match Python's string order whatever the
+        # database's collation.
+        order = Collate(F('pdf_file'), 'C') if connection.vendor == 'postgresql' else F('pdf_file')
+        return (
+            PDFDocument.all_objects
+            .filter(pdf_file__startswith=prefix)
+            .order_by(order, 'pk')
+            .values_list('pdf_file', 'pk')
+            .iterator(chunk_size=self.batch_size)
+        )
+
+    def next_name(self, rows, name):
+        """The next row with a different name; documents can share a file"""
+        row = next(rows, None)
+        while row is not None and row[0] == name:
+            row = next(rows, None)
+        return row
+
+    def report_missing(self, name, document_id):
+        self.missing += 1
+        if self.verbosity >= 1:
+            self.stdout.write(f"Missing: {name} (document {document_id})")
+
+    def check_orphan(self, name, entry):
+        try:
+            stat = entry.stat(follow_symlinks=False)
+        except FileNotFoundError:
+            return
+        if stat.st_mtime >= self.cutoff:
+            return
+        self.orphaned += 1
+        self.orphaned_size += stat.st_size
+        if self.verbosity >= 1:
+            self.stdout.write(f"Orphaned: {name}")
+        if self.delete:
+            self.pending.append(name)
+            if len(self.pending) >= self.batch_size:
+                self.flush()
+
+    def flush(self):
+        """Unlink the pending orphans, except any a new document has started using since the scan"""
+        if not self.pending:
+            return
+        referenced = set(PDFDocument.all_objects.filter(pdf_file__in=self.pending).values_list('pdf_file', flat=True))
+        for name in self.pending:
+            # The storage also spares blobs an upload has just reused.
+            if name not in referenced and pdf_storage.delete_unused(name):
+                self.deleted += 1
+        self.pending = []
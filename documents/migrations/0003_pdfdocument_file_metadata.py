@@ -0,0 +1,28 @@
+# Generated by Django 4.2.16 on 2026-10-18 15:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0002_cardsettings_alter_pdfdocument_parent_card_id_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pdfdocument',
+            name='file_size',
+            field=models.PositiveBigIntegerField(blank=True, db_index=True, editable=False, help_text='File size in bytes', null=True),
+        ),
+        migrations.AddField(
+            model_name='pdfdocument',
+            name='page_count',
+            field=models.PositiveIntegerField(blank=True, db_index=True, editable=False, help_text='Number of pages, if known', null=True),
+        ),
+        migrations.AddField(
+            model_name='pdfdocument',
+            name='sha256',
+            field=models.CharField(blank=True, db_index=True, editable=False, help_text='SHA-256 checksum of the file', max_length=64),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.16 on 2026-10-18 16:00
+
+import os
+
+import django.core.validators
+from django.db import migrations, models
+import documents.models
+import documents.storage
+
+
+def set_original_filenames(apps, schema_editor):
+    PDFDocument = apps.get_model('documents', 'PDFDocument')
+    documents = PDFDocument.objects.filter(original_filename='').order_by('pk').only('pk', 'pdf_file')
+    last_pk = 0
+    while True:
+        batch = list(documents.filter(pk__gt=last_pk)[:500])
+        if not batch:
+            break
+        last_pk = batch[-1].pk
+        for document in batch:
+            document.original_filename = os.path.basename(document.pdf_file.name)
+        PDFDocument.objects.bulk_update(batch, ['original_filename'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0003_pdfdocument_file_metadata'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pdfdocument',
+            name='original_filename',
+            field=models.CharField(blank=True, editable=False, help_text='Name of the file as uploaded', max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='pdfdocument',
+            name='pdf_file',
+            field=models.FileField(db_index=True, help_text='Upload PDF file only', storage=documents.storage.ContentAddressedStorage(), upload_to=documents.models.pdf_upload_path, validators=[django.core.validators.FileExtensionValidator(allowed_extensions=['pdf'])]),
+        ),
+        migrations.RunPython(set_original_filenames, migrations.RunPython.noop),
+    ]
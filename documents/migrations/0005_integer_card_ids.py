@@ -0,0 +1,47 @@
+# Generated by Django 4.2.16 on 2026-10-18 16:03
+
+from django.db import migrations, models
+
+CARD_COLUMNS = ['parent_card_id', 'subcard_id']
+
+
+def convert_text_card_ids(apps, schema_editor):
+    """
+    The models declared the card ids as CharField while the migrations
+    created integer columns. Databases whose columns ended up as text
+    (e.g. from a locally generated migration) are converted in place.
+    """
+    connection = schema_editor.connection
+    PDFDocument = apps.get_model('documents', 'PDFDocument')
+    table = PDFDocument._meta.db_table
+
+    with connection.cursor() as cursor:
+        description = connection.introspection.get_table_description(cursor, table)
+    text_columns = [
+        column.name for column in description
+        if column.name in CARD_COLUMNS
+        and connection.introspection.get_field_type(column.type_code, column) in ('CharField', 'TextField')
+    ]
+
+    for column in text_columns:
+        new_field = PDFDocument._meta.get_field(column)
+        old_field = models.CharField(max_length=100)
+        old_field.set_attributes_from_name(column)
+        old_field.model = PDFDocument
+        # Casts on PostgreSQL (USING ...::integer), rebuilds the table on SQLite.
+        schema_editor.alter_field(PDFDocument, old_field, new_field)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0004_content_addressed_storage'),
+    ]
+
+    operations = [
+        migrations.RunPython(convert_text_card_ids, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='pdfdocument',
+            index=models.Index(fields=['parent_card_id', 'subcard_id', '-uploaded_at'], name='pdfdoc_card_uploaded_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.16 on 2026-10-18 16:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0006_upload_session'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pdfdocument',
+            name='ingest_error',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='pdfdocument',
+            name='ingest_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('valid', 'Valid'), ('corrupt', 'Corrupt'), ('missing', 'File missing')], db_index=True, default='pending', editable=False, help_text='Result of the background check of the file contents', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='pdfdocument',
+            name='ingested_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='pdfdocument',
+            name='pdf_version',
+            field=models.CharField(blank=True, editable=False, help_text='PDF version declared by the file', max_length=8),
+        ),
+        migrations.CreateModel(
+            name='IngestJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('claimed_at', models.DateTimeField(blank=True, db_index=True, null=True)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('document', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='ingest_job', to='documents.pdfdocument')),
+            ],
+        ),
+    ]
@@ -0,0 +1,93 @@
+# Generated by Django 4.2.16 on 2026-10-18 16:16
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# The text search configuration; documents.search.SEARCH_CONFIG must match.
+SEARCH_CONFIG = 'english'
+
+POSTGRESQL_FORWARD = [
+    f"""
+    ALTER TABLE documents_pdftext ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(content, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX documents_pdftext_search_idx ON documents_pdftext USING GIN (search_vector)",
+]
+POSTGRESQL_BACKWARD = [
+    "DROP INDEX IF EXISTS documents_pdftext_search_idx",
+    "ALTER TABLE documents_pdftext DROP COLUMN IF EXISTS search_vector",
+]
+
+# External-content FTS5 table over documents_pdftext, kept in sync by
+# triggers. A later migration that makes SQLite rebuild documents_pdftext
+# drops the triggers and must recreate them.
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE documents_pdftext_fts USING fts5(
+        title, content, content='documents_pdftext', content_rowid='document_id',
+        tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER documents_pdftext_fts_insert AFTER INSERT ON documents_pdftext BEGIN
+        INSERT INTO documents_pdftext_fts(rowid, title, content)
+        VALUES (new.document_id, new.title, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER documents_pdftext_fts_delete AFTER DELETE ON documents_pdftext BEGIN
+        INSERT INTO documents_pdftext_fts(documents_pdftext_fts, rowid, title, content)
+        VALUES ('delete', old.document_id, old.title, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER documents_pdftext_fts_update AFTER UPDATE ON documents_pdftext BEGIN
+        INSERT INTO documents_pdftext_fts(documents_pdftext_fts, rowid, title, content)
+        VALUES ('delete', old.document_id, old.title, old.content);
+        INSERT INTO documents_pdftext_fts(rowid, title, content)
+        VALUES (new.document_id, new.title, new.content);
+    END
+    """,
+]
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS documents_pdftext_fts_update",
+    "DROP TRIGGER IF EXISTS documents_pdftext_fts_delete",
+    "DROP TRIGGER IF EXISTS documents_pdftext_fts_insert",
+    "DROP TABLE IF EXISTS documents_pdftext_fts",
+]
+
+
+def _run(schema_editor, statements_by_vendor):
+    for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+def create_search_index(apps, schema_editor):
+    _run(schema_editor, {'postgresql': POSTGRESQL_FORWARD, 'sqlite': SQLITE_FORWARD})
+
+
+def drop_search_index(apps, schema_editor):
+    _run(schema_editor, {'postgresql': POSTGRESQL_BACKWARD, 'sqlite': SQLITE_BACKWARD})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0007_ingest_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PDFText',
+            fields=[
+                ('document', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='text', serialize=False, to='documents.pdfdocument')),
+                ('title', models.CharField(max_length=200)),
+                ('content', models.TextField(blank=True)),
+                ('extracted_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,41 @@
+from django.db import migrations
+
+# A trigram index serves ILIKE '%...%' and similarity (%) matches on titles
+# for documents.search.autocomplete_titles. Built concurrently so uploads
+# are not blocked on large tables; creating the extension needs a role
+# allowed to do so (pg_trgm is a trusted extension from PostgreSQL 13).
+POSTGRESQL_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    """
+    CREATE INDEX CONCURRENTLY IF NOT EXISTS documents_pdfdocument_title_trgm_idx
+    ON documents_pdfdocument USING GIN (title gin_trgm_ops)
+    """,
+]
+POSTGRESQL_BACKWARD = [
+    "DROP INDEX CONCURRENTLY IF EXISTS documents_pdfdocument_title_trgm_idx",
+]
+
+
+def create_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for statement in POSTGRESQL_FORWARD:
+            schema_editor.execute(statement)
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for statement in POSTGRESQL_BACKWARD:
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('documents', '0008_pdf_text_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.16 on 2026-10-18 16:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0009_title_trigram_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pdfdocument',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, db_index=True, editable=False, help_text='When the document was moved to the trash; it is purged after a grace period', null=True),
+        ),
+    ]
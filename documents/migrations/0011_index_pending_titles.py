@@ -0,0 +1,30 @@
+from django.db import migrations
+from django.utils import timezone
+
+
+def index_pending_titles(apps, schema_editor):
+    PDFDocument = apps.get_model('documents', 'PDFDocument')
+    PDFText = apps.get_model('documents', 'PDFText')
+    documents = PDFDocument.objects.filter(text__isnull=True).order_by('pk').only('pk', 'title')
+    now = timezone.now()
+    last_pk = 0
+    while True:
+        batch = list(documents.filter(pk__gt=last_pk)[:500])
+        if not batch:
+            break
+        last_pk = batch[-1].pk
+        PDFText.objects.bulk_create(
+            [PDFText(document_id=document.pk, title=document.title, content='', extracted_at=now) for document in batch],
+            ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0010_soft_delete'),
+    ]
+
+    operations = [
+        migrations.RunPython(index_pending_titles, migrations.RunPython.noop),
+    ]
@@ -1,35 +1,126 @@
-from django.db import models
+from django.db import models, transaction
+from django.conf import settings as django_settings
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.core.validators import FileExtensionValidator
+from django.urls import reverse
+import copy
 import os
+import time
+import uuid
+
+from .pdf_utils import inspect_pdf
+from .storage import LEGACY_PREFIX, blob_name, pdf_storage
+from .thumbnails import thumbnail_key
 
 def pdf_upload_path(instance, filename):
-    return f'pdf_docs/parent_{instance.parent_card_id}/sub_{instance.subcard_id}/{filename}'
+    # Stored names never depend on the uploaded filename, which is kept in
+    # original_filename for Content-Disposition, so they cannot collide
+    # and storage has no free name to search for.
+    if instance.sha256:
+        return blob_name(instance.sha256)
+    return f'{LEGACY_PREFIX}parent_{instance.parent_card_id}/sub_{instance.subcard_id}/{uuid.uuid4().hex}.pdf'
+
+INGEST_PENDING = 'pending'
+INGEST_VALID = 'valid'
+INGEST_CORRUPT = 'corrupt'
+INGEST_MISSING = 'missing'
+INGEST_STATUS_CHOICES = [
+    (INGEST_PENDING, 'Pending'),
+    (INGEST_VALID, 'Valid'),
+    (INGEST_CORRUPT, 'Corrupt'),
+    (INGEST_MISSING, 'File missing'),
+]
+
+class LiveDocumentManager(models.Manager):
+    """Documents that are not in the trash"""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
 
 class PDFDocument(models.Model):
     title = models.CharField(max_length=200, help_text="Title of the PDF document")
     pdf_file = models.FileField(
         upload_to=pdf_upload_path,
+        storage=pdf_storage,
+        db_index=True,
         validators=[FileExtensionValidator(allowed_extensions=['pdf'])],
         help_text="Upload PDF file only"
     )
+    original_filename = models.CharField(
+        max_length=255,
+        blank=True,
+        editable=False,
+        help_text="Name of the file as uploaded"
+    )
     uploaded_by = models.ForeignKey(
         User, 
         on_delete=models.CASCADE,
         help_text="User who uploaded this document"
     )
     uploaded_at = models.DateTimeField(auto_now_add=True)
-    parent_card_id = models.CharField(
-        max_length=100,
+    parent_card_id = models.IntegerField(
         help_text="Parent card number"
     )
-    subcard_id = models.CharField(
-        max_length=100,
+    subcard_id = models.IntegerField(
         help_text="Subcard number"
     )
+    file_size = models.PositiveBigIntegerField(
+        null=True,
+        blank=True,
+        editable=False,
+        db_index=True,
+        help_text="File size in bytes"
+    )
+    sha256 = models.CharField(
+        max_length=64,
+        blank=True,
+        editable=False,
+        db_index=True,
+        help_text="SHA-256 checksum of the file"
+    )
+    page_count = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        editable=False,
+        db_index=True,
+        help_text="Number of pages, if known"
+    )
+    pdf_version = models.CharField(
+        max_length=8,
+        blank=True,
+        editable=False,
+        help_text="PDF version declared by the file"
+    )
+    ingest_status = models.CharField(
+        max_length=10,
+        choices=INGEST_STATUS_CHOICES,
+        default=INGEST_PENDING,
+        editable=False,
+        db_index=True,
+        help_text="Result of the background check of the file contents"
+    )
+    ingest_error = models.CharField(max_length=255, blank=True, editable=False)
+    ingested_at = models.DateTimeField(null=True, blank=True, editable=False)
+    deleted_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        db_index=True,
+        help_text="When the document was moved to the trash; it is purged after a grace period"
+    )
+
+    # Deleted documents are hidden everywhere except the admin and the
+    # purge_deleted_documents command, which use all_objects.
+    objects = LiveDocumentManager()
+    all_objects = models.Manager()
 
     class Meta:
         ordering = ['-uploaded_at']
+        indexes = [
+            # Matches the dashboard ordering and per-subcard lookups.
+            models.Index(fields=['parent_card_id', 'subcard_id', '-uploaded_at'], name='pdfdoc_card_uploaded_idx'),
+        ]
         verbose_name = "PDF Document"
         verbose_name_plural = "PDF Documents"
     
@@ -37,30 +128,136 @@ class PDFDocument(models.Model):
         return f"{self.title} (P{self.parent_card_id}.{self.subcard_id})"
     
     def get_file_size(self):
-        if self.pdf_file:
+        size = self.file_size
+        if size is None and self.pdf_file:
+            # Rows not yet backfilled by the backfill_pdf_metadata command.
             size = self.pdf_file.size
-            if size < 1024:
-                return f"{size} B"
-            elif size < 1024 * 1024:
-                return f"{size / 1024:.1f} KB"
-            else:
-                return f"{size / (1024 * 1024):.1f} MB"
-        return "Unknown"
+        if size is None:
+            return "Unknown"
+        if size < 1024:
+            return f"{size} B"
+        elif size < 1024 * 1024:
+            return f"{size / 1024:.1f} KB"
+        else:
+            return f"{size / (1024 * 1024):.1f} MB"
+    
+    def set_file_metadata(self, content):
+        # A first page count from the same pass; the ingest queue replaces
+        # it with the parsed count and checks integrity.
+        info = inspect_pdf(content)
+        self.file_size = info.size
+        self.sha256 = info.sha256
+        self.page_count = info.page_count
+    
+    def get_thumbnail_url(self):
+        # The version parameter lets browsers cache the image for good.
+        return f"{reverse('documents:thumbnail', args=[self.pk])}?v={thumbnail_key(self)}"
     
     def get_filename(self):
+        if self.original_filename:
+            return self.original_filename
         if self.pdf_file:
             return os.path.basename(self.pdf_file.name)
         return "No file"
     
+    def save(self, *args, **kwargs):
+        # A newly assigned file is measured before it is written to storage,
+        # so upload_to can place it under its checksum.
+        if self.pdf_file and not self.pdf_file._committed:
+            self.original_filename = os.path.basename(self.pdf_file.name)
+            self.set_file_metadata(self.pdf_file)
+            self.ingest_status = INGEST_PENDING
+            self._needs_ingest = True
+        super().save(*args, **kwargs)
+    
     def delete(self, *args, **kwargs):
-        if self.pdf_file:
-            if os.path.isfile(self.pdf_file.path):
-                os.remove(self.pdf_file.path)
-        super().delete(*args, **kwargs)
+        # Removes the row and file at once; views move documents to the
+        # trash instead (see documents.trash).
+        name = self.pdf_file.name
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            # Several documents can share one stored file; it is only
+            # removed once the last of them is gone.
+            if name and not PDFDocument.all_objects.filter(pdf_file=name).exists():
+                transaction.on_commit(lambda: self.pdf_file.storage.delete_unused(name))
+        return result
+
+class PDFText(models.Model):
+    """
+    Text extracted from a document by the ingest queue, for full-text
+    search. A title-only row (empty content) is created with the document
+    and filled in once the text is extracted. The search index itself is not a model field: PostgreSQL gets
+    a generated tsvector column with a GIN index and SQLite an FTS5 table
+    kept in sync by triggers (see migration 0008 and documents.search).
+    """
+    document = models.OneToOneField(PDFDocument, on_delete=models.CASCADE, primary_key=True, related_name='text')
+    title = models.CharField(max_length=200)
+    content = models.TextField(blank=True)
+    extracted_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"Text of document {self.document_id}"
+
+class IngestJob(models.Model):
+    """
+    A document waiting for the process_ingest_queue workers. A job is
+    claimed by setting claimed_at; a claim older than the lease is taken
+    to belong to a crashed worker and the job is handed out again.
+    """
+    document = models.OneToOneField(PDFDocument, on_delete=models.CASCADE, related_name='ingest_job')
+    created_at = models.DateTimeField(auto_now_add=True)
+    claimed_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+
+    def __str__(self):
+        return f"Ingest document {self.document_id}"
+
+class UploadSession(models.Model):
+    """
+    A PDF being uploaded in parts. The parts are appended to a file in
+    PDF_UPLOAD_TEMP_DIR; ``received`` is the number of bytes stored so far,
+    which is where the client resumes after an interruption.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    title = models.CharField(max_length=200)
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField(help_text="Total file size in bytes")
+    received = models.PositiveBigIntegerField(default=0, help_text="Bytes received so far")
+    parent_card_id = models.IntegerField()
+    subcard_id = models.IntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.filename} ({self.received}/{self.size})"
+
+    @property
+    def part_path(self):
+        return os.path.join(django_settings.PDF_UPLOAD_TEMP_DIR, f'{self.pk}.part')
+
+    @property
+    def is_complete(self):
+        return self.received == self.size
+
+    def delete(self, *args, **kwargs):
+        path = self.part_path
+        result = super().delete(*args, **kwargs)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        return result
 
 class CardSettings(models.Model):
-    max_parent_cards = models.CharField(max_length=100, default='10')
-    max_subcards = models.CharField(max_length=100, default='10')
+    max_parent_cards = models.IntegerField(default=10)
+    max_subcards = models.IntegerField(default=10)
+    
+    # Per-process copy of the singleton, as (version, instance, loaded_at).
+    # The version lives in the shared cache so a save in one worker makes
+    # every other worker reload on its next call.
+    VERSION_KEY = 'card_settings:version'
+    _cached = None
     
     class Meta:
         verbose_name = "Card Settings"
@@ -71,8 +268,33 @@ class CardSettings(models.Model):
         if not self.pk and CardSettings.objects.exists():
             raise ValueError("Only one CardSettings instance allowed")
         super().save(*args, **kwargs)
+        CardSettings.invalidate_cache()
+    
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        CardSettings.invalidate_cache()
+        return result
     
     @classmethod
     def get_settings(cls):
+        version = cache.get(cls.VERSION_KEY)
+        cached = cls._cached
+        if (cached is not None and version is not None and cached[0] == version
+                and time.monotonic() - cached[2] < django_settings.CARD_SETTINGS_CACHE_TIMEOUT):
+            # Callers may modify the instance (e.g. bind it to a ModelForm).
+            return copy.copy(cached[1])
+        
         settings, created = cls.objects.get_or_create(defaults={'max_parent_cards': 10, 'max_subcards': 10})
-        return settings
\ No newline at end of file
+        if version is None:
+            cache.add(cls.VERSION_KEY, int(time.time() * 1000), timeout=None)
+            version = cache.get(cls.VERSION_KEY)
+        cls._cached = (version, settings, time.monotonic())
+        return copy.copy(settings)
+    
+    @classmethod
+    def invalidate_cache(cls):
+        cls._cached = None
+        try:
+            cache.incr(cls.VERSION_KEY)
+        except ValueError:
+            cache.add(cls.VERSION_KEY, int(time.time() * 1000), timeout=None)
@@ -0,0 +1,87 @@
+"""
+Moving documents to another card.
+
+Rows are reassigned with a single UPDATE. Blobs are named by checksum and
+stay where they are; only files still stored under the per-card paths of
+LEGACY_PREFIX are renamed into the new card's directory, within the same
+filesystem, so no file is read or rewritten. If a rename fails the ones
+already done are reversed and the transaction is rolled back.
+"""
+
+import os
+
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+
+from .card_tree import mark_cards_changed
+from .models import PDFDocument, pdf_upload_path
+from .storage import LEGACY_PREFIX, pdf_storage
+
+
+def move_documents(documents, parent_card_id, subcard_id):
+    """Move the documents in the ``documents`` queryset to the given card and return how many moved"""
+    with transaction.atomic():
+        rows = list(
+            documents.select_for_update()
+            .order_by('pk')
+            .values_list('pk', 'pdf_file', 'parent_card_id', 'subcard_id')
+        )
+        if not rows:
+            return 0
+        ids = [pk for pk, name, parent_id, sub_id in rows]
+        renames = _legacy_renames(rows, ids, parent_card_id, subcard_id)
+
+        updates = {'parent_card_id': parent_card_id, 'subcard_id': subcard_id}
+        if renames:
+            updates['pdf_file'] = Case(
+                *[When(pdf_file=old, then=Value(new)) for old, new in renames.items()],
+                default=F('pdf_file'),
+                output_field=PDFDocument._meta.get_field('pdf_file'),
+            )
+        count = PDFDocument.all_objects.filter(pk__in=ids).update(**updates)
+        _rename_files(renames)
+
+    cards = {(parent_id, sub_id) for pk, name, parent_id, sub_id in rows}
+    cards.add((parent_card_id, subcard_id))
+    mark_cards_changed(cards)
+    return count
+
+
+def _legacy_renames(rows, ids, parent_card_id, subcard_id):
+    """Map the legacy file names of ``rows`` to their names under the new card"""
+    target = PDFDocument(parent_card_id=parent_card_id, subcard_id=subcard_id)
+    renames = {}
+    for pk, name, parent_id, sub_id in rows:
+        moving = (parent_id, sub_id) != (parent_card_id, subcard_id)
+        if moving and name.startswith(LEGACY_PREFIX) and name not in renames:
+            # A fresh name, so nothing in the new directory is overwritten.
+            renames[name] = pdf_upload_path(target, os.path.basename(name))
+
+    # A file shared with documents that are not moving keeps its place.
+    shared = (
+        PDFDocument.all_objects
+        .filter(pdf_file__in=list(renames))
+        .exclude(pk__in=ids)
+        .values_list('pdf_file', flat=True)
+    )
+    for name in set(shared):
+        del renames[name]
+    return renames
+
+
+def _rename_files(renames):
+    done = []
+    try:
+        for old, new in renames.items():
+            old_path, new_path = pdf_storage.path(old), pdf_storage.path(new)
+            os.makedirs(os.path.dirname(new_path), exist_ok=True)
+            try:
+                os.rename(old_path, new_path)
+            except FileNotFoundError:
+                # Already missing; reconcile_media reports it.
+                continue
+            done.append((old_path, new_path))
+    except OSError:
+        for old_path, new_path in reversed(done):
+            os.rename(new_path, old_path)
+        raise
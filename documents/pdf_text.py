@@ -0,0 +1,40 @@
+"""
+Plain-text extraction from PDFs, for the search index.
+
+Text is extracted with pypdf page by page, each page decoded with its own
+fonts, and stops as soon as enough has been collected. Layout is not
+kept: the words come out in content stream order, which is good enough
+for word search.
+"""
+
+import re
+
+from pypdf import PdfReader
+
+from .pdf_utils import open_pdf
+
+CONTROL_CHARS_RE = re.compile(r'[\x00-\x1f\x7f-\x9f�]+')
+
+
+def extract_text(source, max_length):
+    """
+    Text of a PDF, collapsed to single spaces and cut at ``max_length``
+    characters. ``source`` is a path or a PdfReader from open_pdf().
+    """
+    if isinstance(source, PdfReader):
+        return _extract(source, max_length)
+    with open_pdf(source) as (structure, reader):
+        return _extract(reader, max_length) if reader is not None else ''
+
+
+def _extract(reader, max_length):
+    words = []
+    length = 0
+    for page in reader.pages:
+        text = CONTROL_CHARS_RE.sub(' ', page.extract_text() or '')
+        for word in text.split():
+            words.append(word)
+            length += len(word) + 1
+            if length >= max_length:
+                return ' '.join(words)[:max_length]
+    return ' '.join(words)
@@ -0,0 +1,155 @@
+"""
+Helpers for inspecting PDF file contents.
+
+Uploads are only hashed and skimmed for page objects while they stream
+in; the ingest queue opens them properly with pypdf, whose decompression
+limits (pypdf.filters) bound what a hostile file can make it allocate.
+"""
+
+import hashlib
+import os
+import re
+import signal
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+
+from pypdf import PdfReader
+from pypdf.errors import PyPdfError
+
+CHUNK_SIZE = 64 * 1024
+
+PDFInfo = namedtuple('PDFInfo', ['size', 'sha256', 'page_count'])
+PDFStructure = namedtuple('PDFStructure', ['version', 'page_count', 'error'])
+
+# Leaf page objects; '/Type /Pages' (the page tree nodes) is excluded.
+PAGE_OBJECT_RE = re.compile(rb'/Type\s*/Page(?![A-Za-z])')
+# Bytes carried between chunks so a match split across them is still seen.
+PAGE_OBJECT_OVERLAP = 32
+
+HEADER_RE = re.compile(rb'%PDF-(\d\.\d)')
+HEADER_WINDOW = 1024
+TRAILER_WINDOW = 2048
+
+
+def inspect_pdf(fileobj, count_pages=True):
+    """
+    Read ``fileobj`` once in chunks and return its size, SHA-256 and page
+    count. The page count is None when it cannot be read from the raw bytes
+    (e.g. page objects packed into compressed object streams), or when
+    ``count_pages`` is false.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    pages = 0
+    pending = b''
+
+    for chunk in _iter_chunks(fileobj):
+        digest.update(chunk)
+        size += len(chunk)
+        if not count_pages:
+            continue
+        # Matches starting in the last few bytes are left for the next
+        # round so that one split across two chunks is counted exactly once.
+        pending += chunk
+        limit = len(pending) - PAGE_OBJECT_OVERLAP
+        if limit > 0:
+            pages += sum(1 for match in PAGE_OBJECT_RE.finditer(pending) if match.start() < limit)
+            pending = pending[limit:]
+    pages += len(PAGE_OBJECT_RE.findall(pending))
+
+    return PDFInfo(size=size, sha256=digest.hexdigest(), page_count=pages or None)
+
+
+class PDFTimeLimitExceeded(BaseException):
+    """
+    Raised when parsing a file outlasts its time limit. A BaseException so
+    that the broad recovery handlers inside pypdf do not swallow it.
+    """
+
+
+@contextmanager
+def time_limit(seconds):
+    """
+    Raise PDFTimeLimitExceeded if the block runs longer than ``seconds``.
+    Enforced with SIGALRM, so only in a process's main thread (as in the
+    ingest workers); elsewhere the block runs unbounded.
+    """
+    if not seconds or not hasattr(signal, 'setitimer') or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    def expired(signum, frame):
+        raise PDFTimeLimitExceeded(f"Took longer than {seconds} seconds to read.")
+
+    previous = signal.signal(signal.SIGALRM, expired)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def parse_pdf(path):
+    """
+    Check the structure of the PDF at ``path`` and return its version,
+    page count and an error message (None if the file looks intact).
+    """
+    with open_pdf(path) as (structure, reader):
+        return structure
+
+
+@contextmanager
+def open_pdf(path):
+    """
+    Open the PDF at ``path`` with pypdf and yield (PDFStructure, reader).
+    The reader is None when the structure has an error, and only usable
+    inside the block: it reads objects from the open file as needed.
+    """
+    with open(path, 'rb') as pdf_file:
+        structure, reader = _read_structure(pdf_file)
+        yield structure, reader
+
+
+def _read_structure(pdf_file):
+    size = os.fstat(pdf_file.fileno()).st_size
+    if not size:
+        return PDFStructure(None, None, "File is empty."), None
+    header = HEADER_RE.search(pdf_file.read(HEADER_WINDOW))
+    if not header:
+        return PDFStructure(None, None, "No PDF header."), None
+    version = header.group(1).decode()
+    pdf_file.seek(max(size - TRAILER_WINDOW, 0))
+    if b'%%EOF' not in pdf_file.read():
+        return PDFStructure(version, None, "No end-of-file marker; the file is truncated."), None
+    pdf_file.seek(0)
+
+    try:
+        # Damaged cross-reference data is rebuilt rather than rejected,
+        # as viewers do.
+        reader = PdfReader(pdf_file, strict=False)
+        if reader.is_encrypted and not reader.decrypt(''):
+            # Readable only with a password; nothing to check or index.
+            return PDFStructure(version, None, None), None
+        page_count = len(reader.pages)
+        catalog_version = reader.trailer['/Root'].get('/Version')
+    except PyPdfError as error:
+        return PDFStructure(version, None, f"Could not be read: {error}"[:255]), None
+    # The catalog may declare a later version than the header.
+    if catalog_version and str(catalog_version).lstrip('/') > version:
+        version = str(catalog_version).lstrip('/')[:8]
+    return PDFStructure(version, page_count, None), reader
+
+
+def _iter_chunks(fileobj):
+    if hasattr(fileobj, 'chunks'):
+        yield from fileobj.chunks(CHUNK_SIZE)
+        return
+    if hasattr(fileobj, 'seek'):
+        fileobj.seek(0)
+    while True:
+        chunk = fileobj.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        yield chunk
@@ -0,0 +1,214 @@
+"""
+Full-text search over the text the ingest queue extracts from PDFs, and
+title autocomplete.
+
+PostgreSQL matches against the generated ``search_vector`` column (GIN
+indexed) and ranks with ts_rank_cd; SQLite, for local development, uses
+the FTS5 table documents_pdftext_fts and bm25. Both are created by
+migration 0008. Other databases fall back to matching titles.
+
+Every document has a PDFText row from the moment it is created, holding
+only its title until the ingest queue fills in the text, so pending,
+corrupt and textless documents are still found by title.
+
+Title autocomplete uses the pg_trgm GIN index from migration 0009, which
+serves both substring (ILIKE) and fuzzy (similarity) matches; elsewhere
+it falls back to substring matches. Results are cached per query until
+any document changes.
+"""
+
+import hashlib
+import re
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Case, IntegerField, Value, When
+from django.utils import timezone
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .card_tree import current_version
+from .models import PDFDocument, PDFText
+
+# Must match the configuration the search_vector column is generated with.
+SEARCH_CONFIG = 'english'
+
+# Private-use characters delimit the matches in headlines, so they cannot
+# be confused with document text before it is escaped.
+MATCH_START = '\ue000'
+MATCH_STOP = '\ue001'
+HEADLINE_OPTIONS = (
+    f'StartSel={MATCH_START}, StopSel={MATCH_STOP}, MaxWords=30, MinWords=12, '
+    'MaxFragments=2, FragmentDelimiter=" … "'
+)
+SNIPPET_TOKENS = 24
+
+SEARCH_TERM_RE = re.compile(r'\w+')
+
+SearchHit = namedtuple('SearchHit', ['document', 'rank', 'headline'])
+
+
+def index_titles(documents):
+    """Add title-only search entries for new ``documents``; existing entries are kept"""
+    now = timezone.now()
+    PDFText.objects.bulk_create(
+        [PDFText(document_id=document.pk, title=document.title, content='', extracted_at=now) for document in documents],
+        ignore_conflicts=True,
+    )
+
+
+def search_documents(query, limit, offset=0):
+    """
+    Return up to ``limit`` SearchHits for ``query``, best match first.
+    Headlines are HTML with the matched words wrapped in <mark>.
+    """
+    query = query.strip()
+    if not query:
+        return []
+
+    if connection.vendor == 'postgresql':
+        rows = _search_postgresql(query, limit, offset)
+    elif connection.vendor == 'sqlite':
+        rows = _search_sqlite(query, limit, offset)
+    else:
+        rows = _search_titles(query, limit, offset)
+
+    documents = (
+        PDFDocument.objects
+        .select_related('uploaded_by')
+        .only('id', 'title', 'parent_card_id', 'subcard_id', 'uploaded_at', 'sha256', 'page_count',
+              'uploaded_by__username')
+        .in_bulk([document_id for document_id, rank, headline in rows])
+    )
+    return [
+        SearchHit(documents[document_id], rank, _highlight(headline))
+        for document_id, rank, headline in rows
+        if document_id in documents
+    ]
+
+
+def _search_postgresql(query, limit, offset):
+    # Headlines are costly, so they are only built for the page of hits.
+    sql = """
+        WITH hits AS (
+            SELECT t.document_id, t.content, q.query,
+                   ts_rank_cd(t.search_vector, q.query) AS score
+            FROM documents_pdftext t
+            JOIN documents_pdfdocument d ON d.id = t.document_id,
+                 websearch_to_tsquery(%s::regconfig, %s) AS q(query)
+            WHERE t.search_vector @@ q.query AND d.deleted_at IS NULL
+            ORDER BY score DESC, t.document_id DESC
+            LIMIT %s OFFSET %s
+        )
+        SELECT document_id, score, ts_headline(%s::regconfig, content, query, %s)
+        FROM hits
+        ORDER BY score DESC, document_id DESC
+    """
+    params = [SEARCH_CONFIG, query, limit, offset, SEARCH_CONFIG, HEADLINE_OPTIONS]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def _search_sqlite(query, limit, offset):
+    terms = SEARCH_TERM_RE.findall(query)
+    if not terms:
+        return []
+    # Each word quoted, so user input cannot use FTS5 query syntax.
+    match = ' '.join('"{}"'.format(term.replace('"', '""')) for term in terms)
+    sql = """
+        SELECT documents_pdftext_fts.rowid, -bm25(documents_pdftext_fts, 10.0, 1.0) AS score,
+               snippet(documents_pdftext_fts, 1, %s, %s, ' … ', %s)
+        FROM documents_pdftext_fts
+        JOIN documents_pdfdocument d ON d.id = documents_pdftext_fts.rowid
+        WHERE documents_pdftext_fts MATCH %s AND d.deleted_at IS NULL
+        ORDER BY score DESC, documents_pdftext_fts.rowid DESC
+        LIMIT %s OFFSET %s
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [MATCH_START, MATCH_STOP, SNIPPET_TOKENS, match, limit, offset])
+        return cursor.fetchall()
+
+
+def _search_titles(query, limit, offset):
+    ids = (
+        PDFDocument.objects
+        .filter(title__icontains=query)
+        .order_by('-uploaded_at', '-id')
+        .values_list('id', flat=True)[offset:offset + limit]
+    )
+    return [(document_id, 0.0, '') for document_id in ids]
+
+
+def _highlight(headline):
+    html = escape(headline or '')
+    return mark_safe(html.replace(MATCH_START, '<mark>').replace(MATCH_STOP, '</mark>'))
+
+
+AUTOCOMPLETE_FIELDS = ['id', 'title', 'parent_card_id', 'subcard_id']
+AUTOCOMPLETE_KEY = 'autocomplete:{}:{}:{}'
+
+
+def autocomplete_titles(query, limit):
+    """
+    Up to ``limit`` documents whose title matches ``query``, as dicts of
+    AUTOCOMPLETE_FIELDS: titles starting with it first, then other
+    substring and (on PostgreSQL) similar-looking titles.
+    """
+    query = ' '.join(query.split())
+    if len(query) < settings.AUTOCOMPLETE_MIN_LENGTH:
+        return []
+
+    # Keyed by the card tree version, which every document change bumps.
+    digest = hashlib.md5(query.lower().encode()).hexdigest()
+    key = AUTOCOMPLETE_KEY.format(current_version(), limit, digest)
+    results = cache.get(key)
+    if results is None:
+        if connection.vendor == 'postgresql':
+            results = _autocomplete_postgresql(query, limit)
+        else:
+            results = _autocomplete_substring(query, limit)
+        cache.set(key, results, settings.AUTOCOMPLETE_CACHE_TIMEOUT)
+    return results
+
+
+def _like_escape(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _autocomplete_postgresql(query, limit):
+    # Both conditions can use the trigram index; "%%" is pg_trgm's
+    # similarity operator, escaped for the DB-API.
+    sql = """
+        SELECT id, title, parent_card_id, subcard_id
+        FROM documents_pdfdocument
+        WHERE deleted_at IS NULL AND (title ILIKE %(contains)s OR title %% %(query)s)
+        ORDER BY title ILIKE %(prefix)s DESC, similarity(title, %(query)s) DESC, id DESC
+        LIMIT %(limit)s
+    """
+    escaped = _like_escape(query)
+    params = {
+        'query': query,
+        'prefix': escaped + '%',
+        'contains': '%' + escaped + '%',
+        'limit': limit,
+    }
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [dict(zip(AUTOCOMPLETE_FIELDS, row)) for row in cursor.fetchall()]
+
+
+def _autocomplete_substring(query, limit):
+    return list(
+        PDFDocument.objects
+        .filter(title__icontains=query)
+        .annotate(is_prefix=Case(
+            When(title__istartswith=query, then=Value(1)),
+            default=Value(0),
+            output_field=IntegerField(),
+        ))
+        .order_by('-is_prefix', 'title', '-id')
+        .values(*AUTOCOMPLETE_FIELDS)[:limit]
+    )
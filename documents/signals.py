@@ -0,0 +1,46 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .card_tree import mark_cards_changed
+from .ingest import enqueue_ingest
+from .models import PDFDocument, PDFText
+from .search import index_titles
+
+
+@receiver(pre_save, sender=PDFDocument)
+def remember_previous_card(sender, instance, **kwargs):
+    # An edit can move a document to another card; both cards change.
+    instance._previous_card = None
+    if instance.pk:
+        instance._previous_card = (
+            sender.all_objects.filter(pk=instance.pk)
+            .values_list('parent_card_id', 'subcard_id')
+            .first()
+        )
+
+
+@receiver(post_save, sender=PDFDocument)
+def pdf_document_saved(sender, instance, created, **kwargs):
+    cards = [(instance.parent_card_id, instance.subcard_id)]
+    if getattr(instance, '_previous_card', None):
+        cards.append(instance._previous_card)
+    # After commit, so a snapshot rebuilt at the new version sees the change.
+    transaction.on_commit(lambda: mark_cards_changed(cards))
+
+    if created:
+        index_titles([instance])
+    if created or getattr(instance, '_needs_ingest', False):
+        instance._needs_ingest = False
+        enqueue_ingest([instance.pk])
+    else:
+        # The indexed copy of the title follows renames.
+        PDFText.objects.filter(document=instance).exclude(title=instance.title).update(title=instance.title)
+
+
+@receiver(post_delete, sender=PDFDocument)
+def pdf_document_deleted(sender, instance, **kwargs):
+    # Documents purged from the trash already left the card tree.
+    if instance.deleted_at is None:
+        cards = [(instance.parent_card_id, instance.subcard_id)]
+        transaction.on_commit(lambda: mark_cards_changed(cards))
@@ -0,0 +1,89 @@
+"""
+Content-addressed storage for uploaded PDFs.
+Each distinct file is stored once under a name derived from its SHA-256,
+so identical uploads share a single blob on disk.
+"""
+
+import os
+import time
+import uuid
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+
+BLOB_PREFIX = 'pdf_blobs/'
+# Per-card paths of files uploaded before blobs were introduced.
+LEGACY_PREFIX = 'pdf_docs/'
+
+
+def blob_name(sha256):
+    """Storage name of the blob holding the content with this checksum"""
+    return f'{BLOB_PREFIX}{sha256[:2]}/{sha256[2:4]}/{sha256}.pdf'
+
+
+def is_blob_name(name):
+    return bool(name) and name.startswith(BLOB_PREFIX)
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    FileSystemStorage that skips writing blobs which already exist and
+    writes new ones through a temporary file, so a blob is never visible
+    under its final name half-written.
+    Names outside BLOB_PREFIX (files uploaded before blobs were introduced)
+    behave exactly as with FileSystemStorage.
+
+    Reusing a blob and unlinking it are coordinated through its mtime: an
+    upload that reuses a blob touches it before its row is committed, and
+    delete_unused() leaves blobs touched within PDF_BLOB_REUSE_GRACE alone
+    (reconcile_media removes them later if they stay unreferenced).
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # A blob's name is its content, so an existing file under it is
+        # the same file; there is nothing to probe for.
+        if is_blob_name(name):
+            return name
+        return super().get_available_name(name, max_length=max_length)
+
+    def save(self, name, content, max_length=None):
+        if is_blob_name(name) and self.reuse(name):
+            return name
+        return super().save(name, content, max_length=max_length)
+
+    def reuse(self, name):
+        """Mark the existing blob ``name`` as just used; False if there is none"""
+        try:
+            os.utime(self.path(name))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def delete_unused(self, name):
+        """
+        Delete a file no document references any more, unless it is a blob
+        an upload may be about to reference. Returns whether it was deleted.
+        """
+        if is_blob_name(name):
+            try:
+                modified = os.stat(self.path(name)).st_mtime
+            except FileNotFoundError:
+                return False
+            if time.time() - modified < settings.PDF_BLOB_REUSE_GRACE:
+                return False
+        self.delete(name)
+        return True
+
+    def _save(self, name, content):
+        if not is_blob_name(name):
+            return super()._save(name, content)
+
+        temp_name = f'{name}.{uuid.uuid4().hex}.tmp'
+        temp_name = super()._save(temp_name, content)
+        # Same directory, so this is an atomic rename; an identical blob
+        # written concurrently is simply replaced by the same bytes.
+        os.replace(self.path(temp_name), self.path(name))
+        return name
+
+
+pdf_storage = ContentAddressedStorage()
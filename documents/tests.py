@@ -0,0 +1,689 @@
+import io
+import os
+import random
+import tempfile
+import time
+import zipfile
+import zlib
+from datetime import timedelta
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from . import thumbnails
+from .bulk_upload import ingest_pdfs
+from .card_tree import SNAPSHOT_KEY, current_version, get_card_tree
+from .chunked_upload import start_session
+from .delivery import MAX_RANGES, parse_range_header
+from .ingest import claim_jobs, parse_job, record_results
+from .models import INGEST_CORRUPT, INGEST_MISSING, INGEST_VALID, IngestJob, PDFDocument, PDFText, UploadSession
+from .move import move_documents
+from .pdf_text import extract_text
+from .pdf_utils import parse_pdf
+from .search import search_documents
+from .storage import blob_name, pdf_storage
+from .trash import purge_deleted, restore, soft_delete
+
+HELLO_CONTENT = b'BT /F1 12 Tf 72 720 Td (Hello searchable world) Tj ET'
+
+# Maps <01> to 'H', <02> to 'i' and <03>..<05> to 'a'..'c'.
+TO_UNICODE_CMAP = (
+    b'/CIDInit /ProcSet findresource begin 12 dict begin begincmap\n'
+    b'1 begincodespacerange <00> <FF> endcodespacerange\n'
+    b'2 beginbfchar <01> <0048> <02> <0069> endbfchar\n'
+    b'1 beginbfrange <03> <05> <0061> endbfrange\n'
+    b'endcmap CMapName currentdict /CMap defineresource pop end end'
+)
+
+
+def stream(data, dictionary=b'', compress=False):
+    if compress:
+        data = zlib.compress(data)
+        dictionary += b' /Filter /FlateDecode'
+    return b'<< /Length %d%s >>\nstream\n%s\nendstream' % (len(data), dictionary, data)
+
+
+def build_pdf(objects, version=b'1.4', packed=None):
+    """
+    A PDF of ``objects``, a dict of object number to body, with a valid
+    cross-reference table and trailer. ``packed`` maps the numbers of
+    objects stored in object streams to (stream number, index); they need
+    a cross-reference stream, which is then written instead.
+    """
+    packed = packed or {}
+    out = b'%PDF-' + version + b'\n'
+    offsets = {}
+    for number, body in sorted(objects.items()):
+        offsets[number] = len(out)
+        out += b'%d 0 obj\n%s\nendobj\n' % (number, body)
+    size = max([*objects, *packed]) + 1
+    xref = len(out)
+    if packed:
+        entries = b''.join(
+            b'\x01' + offsets[number].to_bytes(4, 'big') + b'\x00\x00' if number in offsets
+            else b'\x02' + packed[number][0].to_bytes(4, 'big') + packed[number][1].to_bytes(2, 'big') if number in packed
+            else b'\x00' * 7
+            for number in range(size + 1)
+        )
+        xref_stream = stream(entries, b' /Type /XRef /Size %d /W [1 4 2] /Root 1 0 R' % (size + 1))
+        out += b'%d 0 obj\n%s\nendobj\n' % (size, xref_stream)
+        return out + b'startxref\n%d\n%%%%EOF\n' % xref
+    out += b'xref\n0 %d\n0000000000 65535 f \n' % size
+    for number in range(1, size):
+        if number in offsets:
+            out += b'%010d 00000 n \n' % offsets[number]
+        else:
+            out += b'0000000000 00000 f \n'
+    out += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (size, xref)
+    return out
+
+
+def page_objects(content, font=b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>'):
+    return {
+        1: b'<< /Type /Catalog /Pages 2 0 R >>',
+        2: b'<< /Type /Pages /Kids [3 0 R] /Count 1 >>',
+        3: b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] '
+           b'/Resources << /Font << /F1 5 0 R >> >> /Contents 4 0 R >>',
+        4: stream(content),
+        5: font,
+    }
+
+
+class PDFFileTestCase(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def write(self, data, name='test.pdf'):
+        path = os.path.join(self.directory, name)
+        with open(path, 'wb') as pdf_file:
+            pdf_file.write(data)
+        return path
+
+
+class DocumentTestCase(TestCase):
+    """Documents stored under a temporary MEDIA_ROOT, with an empty cache"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        media_settings = self.settings(MEDIA_ROOT=directory.name, THUMBNAIL_CACHE_DIR=os.path.join(directory.name, 'thumbs'))
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_user('staff', 'staff@example.com', 'password', is_staff=True)
+
+    def make_document(self, data=None, title='Document', parent_card_id=1, subcard_id=1):
+        document = PDFDocument(title=title, uploaded_by=self.user, parent_card_id=parent_card_id, subcard_id=subcard_id)
+        document.pdf_file = ContentFile(data or build_pdf(page_objects(HELLO_CONTENT)), name='upload.pdf')
+        document.save()
+        return document
+
+
+class ExtractTextTests(PDFFileTestCase):
+    def test_content_stream_extracted_once(self):
+        path = self.write(build_pdf(page_objects(HELLO_CONTENT)))
+        self.assertEqual(extract_text(path, 1000), 'Hello searchable world')
+
+    def test_each_page_extracted_once(self):
+        objects = page_objects(b'BT /F1 12 Tf 72 720 Td (First) Tj ET')
+        objects[2] = b'<< /Type /Pages /Kids [3 0 R 6 0 R] /Count 2 >>'
+        objects[6] = b'<< /Type /Page /Parent 2 0 R /Resources << /Font << /F1 5 0 R >> >> /Contents 7 0 R >>'
+        objects[7] = stream(b'BT /F1 12 Tf 72 720 Td (Second) Tj ET', compress=True)
+        path = self.write(build_pdf(objects))
+        self.assertEqual(extract_text(path, 1000), 'First Second')
+
+    def test_to_unicode_cmap(self):
+        objects = page_objects(
+            b'BT /F1 12 Tf 72 720 Td <0102> Tj 0 -14 Td [<03> 10 <0405>] TJ ET',
+            font=b'<< /Type /Font /Subtype /Type0 /BaseFont /Custom /ToUnicode 6 0 R >>',
+        )
+        objects[6] = stream(TO_UNICODE_CMAP, compress=True)
+        path = self.write(build_pdf(objects))
+        self.assertEqual(extract_text(path, 1000), 'Hi abc')
+
+    def test_font_in_object_stream(self):
+        objects = page_objects(b'BT /F1 12 Tf 72 720 Td <0102> Tj ET')
+        del objects[5]
+        font = b'<< /Type /Font /Subtype /Type0 /BaseFont /Custom /ToUnicode 6 0 R >>'
+        header = b'5 0 '
+        objects[6] = stream(TO_UNICODE_CMAP)
+        objects[7] = stream(header + font, b' /Type /ObjStm /N 1 /First %d' % len(header), compress=True)
+        path = self.write(build_pdf(objects, packed={5: (7, 0)}))
+        self.assertEqual(extract_text(path, 1000), 'Hi')
+
+    def test_cut_at_max_length(self):
+        path = self.write(build_pdf(page_objects(HELLO_CONTENT)))
+        self.assertEqual(extract_text(path, 10), 'Hello sear')
+
+    def test_fonts_resolved_per_page(self):
+        # Both pages call their font /F1, but only the first one's has a ToUnicode map.
+        objects = page_objects(
+            b'BT /F1 12 Tf 72 720 Td <0102> Tj ET',
+            font=b'<< /Type /Font /Subtype /Type0 /BaseFont /Custom /ToUnicode 6 0 R >>',
+        )
+        objects[2] = b'<< /Type /Pages /Kids [3 0 R 7 0 R] /Count 2 >>'
+        objects[6] = stream(TO_UNICODE_CMAP)
+        objects[7] = b'<< /Type /Page /Parent 2 0 R /Resources << /Font << /F1 9 0 R >> >> /Contents 8 0 R >>'
+        objects[8] = stream(b'BT /F1 12 Tf 72 720 Td (Plain) Tj ET')
+        objects[9] = b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>'
+        path = self.write(build_pdf(objects))
+        self.assertEqual(extract_text(path, 1000), 'Hi Plain')
+
+    def test_objects_without_endobj(self):
+        data = build_pdf(page_objects(HELLO_CONTENT)).replace(b'endobj', b'')
+        path = self.write(data)
+        self.assertEqual(extract_text(path, 1000), 'Hello searchable world')
+
+    def test_empty_file(self):
+        self.assertEqual(extract_text(self.write(b''), 1000), '')
+
+
+class ParsePDFTests(PDFFileTestCase):
+    def test_intact(self):
+        path = self.write(build_pdf(page_objects(HELLO_CONTENT), version=b'1.5'))
+        self.assertEqual(parse_pdf(path), ('1.5', 1, None))
+
+    def test_empty(self):
+        self.assertEqual(parse_pdf(self.write(b'')).error, "File is empty.")
+
+    def test_no_header(self):
+        self.assertEqual(parse_pdf(self.write(b'not a pdf')).error, "No PDF header.")
+
+    def test_truncated(self):
+        data = build_pdf(page_objects(HELLO_CONTENT))
+        structure = parse_pdf(self.write(data[:len(data) // 2]))
+        self.assertEqual(structure.version, '1.4')
+        self.assertIn("truncated", structure.error)
+
+    def test_invalid_xref_offset_is_rebuilt(self):
+        data = build_pdf(page_objects(HELLO_CONTENT))
+        start = data.rindex(b'startxref')
+        data = data[:start] + b'startxref\n%d\n%%%%EOF\n' % (len(data) - 20)
+        self.assertEqual(parse_pdf(self.write(data)), ('1.4', 1, None))
+
+    def test_unreadable(self):
+        data = build_pdf({1: b'<< /Type /Catalog /Pages 2 0 R >>', 2: b'<< /Type /Pages /Kids 9 0 R >>'})
+        structure = parse_pdf(self.write(data))
+        self.assertTrue(structure.error.startswith("Could not be read"))
+
+    def test_catalog_version(self):
+        objects = page_objects(HELLO_CONTENT)
+        objects[1] = b'<< /Type /Catalog /Pages 2 0 R /Version /1.7 >>'
+        self.assertEqual(parse_pdf(self.write(build_pdf(objects))).version, '1.7')
+
+
+@override_settings(THUMBNAIL_RENDER_ON_INGEST=False, SEARCH_MAX_TEXT_LENGTH=1000)
+class ParseJobTests(PDFFileTestCase):
+    def test_valid(self):
+        path = self.write(build_pdf(page_objects(HELLO_CONTENT)))
+        result = parse_job((1, 2, path, None))
+        self.assertEqual((result.job_id, result.document_id), (1, 2))
+        self.assertEqual(result.status, INGEST_VALID)
+        self.assertEqual(result.page_count, 1)
+        self.assertEqual(result.text, 'Hello searchable world')
+
+    def test_missing(self):
+        result = parse_job((1, 2, os.path.join(self.directory, 'gone.pdf'), None))
+        self.assertEqual(result.status, INGEST_MISSING)
+
+    def test_parser_error_marks_only_that_file_corrupt(self):
+        path = self.write(build_pdf(page_objects(HELLO_CONTENT)))
+        with mock.patch('documents.ingest.open_pdf', side_effect=TypeError("unexpected")):
+            result = parse_job((1, 2, path, None))
+        self.assertEqual(result.status, INGEST_CORRUPT)
+        self.assertEqual(result.error, "unexpected")
+
+    @override_settings(PDF_PARSE_TIME_LIMIT=0.05)
+    def test_time_limit(self):
+        path = self.write(build_pdf(page_objects(HELLO_CONTENT)))
+        with mock.patch('documents.pdf_utils.PdfReader', side_effect=lambda *args, **kwargs: time.sleep(1)):
+            result = parse_job((1, 2, path, None))
+        self.assertEqual(result.status, INGEST_CORRUPT)
+        self.assertIn("Took longer", result.error)
+
+    def test_text_extraction_error_keeps_file_valid(self):
+        path = self.write(build_pdf(page_objects(HELLO_CONTENT)))
+        with mock.patch('documents.ingest.extract_text', side_effect=TypeError):
+            result = parse_job((1, 2, path, None))
+        self.assertEqual(result.status, INGEST_VALID)
+        self.assertEqual(result.text, '')
+
+    def test_corrupted_copies_never_raise(self):
+        objects = page_objects(HELLO_CONTENT)
+        objects[6] = stream(TO_UNICODE_CMAP, compress=True)
+        data = build_pdf(objects)
+        generator = random.Random(0)
+        for attempt in range(300):
+            corrupted = bytearray(data)
+            for _ in range(generator.randint(1, 8)):
+                corrupted[generator.randrange(len(corrupted))] = generator.randrange(256)
+            if generator.random() < 0.3:
+                del corrupted[generator.randrange(len(corrupted)):]
+            path = self.write(bytes(corrupted), f'corrupted_{attempt}.pdf')
+            result = parse_job((attempt, attempt, path, None))
+            self.assertIn(result.status, (INGEST_VALID, INGEST_CORRUPT))
+
+
+class ParseRangeHeaderTests(SimpleTestCase):
+    def test_ignored(self):
+        for header in ['', 'items=0-1', 'bytes=', 'bytes=5', 'bytes=a-b', 'bytes=9-3', 'bytes=-x']:
+            with self.subTest(header=header):
+                self.assertIsNone(parse_range_header(header, 100))
+
+    def test_single_ranges(self):
+        self.assertEqual(parse_range_header('bytes=0-9', 100), [(0, 9)])
+        self.assertEqual(parse_range_header('bytes=90-', 100), [(90, 99)])
+        self.assertEqual(parse_range_header('bytes=90-500', 100), [(90, 99)])
+        self.assertEqual(parse_range_header('bytes=-10', 100), [(90, 99)])
+        self.assertEqual(parse_range_header('bytes=-500', 100), [(0, 99)])
+
+    def test_unsatisfiable(self):
+        self.assertEqual(parse_range_header('bytes=100-', 100), [])
+        self.assertEqual(parse_range_header('bytes=-0', 100), [])
+
+    def test_sorted_and_merged(self):
+        self.assertEqual(
+            parse_range_header('bytes=50-59, 0-9, 5-19, 20-29, 200-', 100),
+            [(0, 29), (50, 59)],
+        )
+
+    def test_too_many_ranges(self):
+        spec = ','.join(f'{i * 2}-{i * 2}' for i in range(MAX_RANGES + 1))
+        self.assertIsNone(parse_range_header(f'bytes={spec}', 1000))
+
+
+
+class PDFDeliveryTests(DocumentTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+        self.data = build_pdf(page_objects(HELLO_CONTENT))
+        self.document = self.make_document(self.data)
+        self.url = reverse('documents:view_pdf', args=[self.document.pk])
+
+    def test_single_range(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 0-9/{len(self.data)}')
+        self.assertEqual(b''.join(response.streaming_content), self.data[:10])
+
+    def test_multiple_ranges(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-4,-5')
+        self.assertEqual(response.status_code, 206)
+        content_type, _, boundary = response['Content-Type'].partition('; boundary=')
+        self.assertEqual(content_type, 'multipart/byteranges')
+        body = b''.join(response.streaming_content)
+        self.assertEqual(len(body), int(response['Content-Length']))
+        size = len(self.data)
+        self.assertEqual(body, (
+            f'--{boundary}\r\nContent-Type: application/pdf\r\nContent-Range: bytes 0-4/{size}\r\n\r\n'.encode()
+            + self.data[:5]
+            + f'\r\n--{boundary}\r\nContent-Type: application/pdf\r\n'
+              f'Content-Range: bytes {size - 5}-{size - 1}/{size}\r\n\r\n'.encode()
+            + self.data[-5:]
+            + f'\r\n--{boundary}--\r\n'.encode()
+        ))
+
+    def test_unsatisfiable_range(self):
+        response = self.client.get(self.url, HTTP_RANGE=f'bytes={len(self.data)}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.data)}')
+
+    def test_if_range_mismatch_sends_whole_file(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.data)
+
+    def test_if_range_match(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=etag)
+        self.assertEqual(response.status_code, 206)
+
+    def test_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+class CardTreeTests(DocumentTestCase):
+    def test_version_changes_only_after_commit(self):
+        get_card_tree()
+        before = current_version()
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.make_document()
+            self.assertEqual(current_version(), before)
+        self.assertEqual(len(callbacks), 1)
+        self.assertGreater(current_version(), before)
+        organized_docs, recent_pdfs, document_count = get_card_tree()
+        self.assertEqual((organized_docs, document_count), ({1: {1: 1}}, 1))
+
+    @override_settings(CARD_TREE_SNAPSHOT_TIMEOUT=60)
+    def test_snapshot_expires_without_shared_cache(self):
+        self.make_document()
+        with mock.patch('documents.card_tree.cache.set') as cache_set:
+            get_card_tree()
+        cache_set.assert_called_once_with(SNAPSHOT_KEY, mock.ANY, timeout=60)
+
+
+class SearchTests(DocumentTestCase):
+    def test_pending_document_found_by_title(self):
+        document = self.make_document(title='Quarterly report')
+        self.assertEqual(PDFText.objects.get(document=document).content, '')
+        hits = search_documents('quarterly', 10)
+        self.assertEqual([hit.document.pk for hit in hits], [document.pk])
+
+    def test_rename_updates_title_only_entry(self):
+        document = self.make_document(title='Draft')
+        document.title = 'Final minutes'
+        document.save()
+        self.assertEqual([hit.document.pk for hit in search_documents('minutes', 10)], [document.pk])
+
+
+def jpeg(size=(40, 60)):
+    output = io.BytesIO()
+    Image.new('RGB', size, 'red').save(output, format='JPEG')
+    return output.getvalue()
+
+
+def image_pages(image_page):
+    """Two pages, the JPEG image drawn on page ``image_page`` (1 or 2)"""
+    image_resources = b'/Resources << /XObject << /Im1 7 0 R >> >> /Contents 8 0 R'
+    text_resources = b'/Resources << /Font << /F1 5 0 R >> >> /Contents 4 0 R'
+    first, second = (image_resources, text_resources) if image_page == 1 else (text_resources, image_resources)
+    return {
+        1: b'<< /Type /Catalog /Pages 2 0 R >>',
+        2: b'<< /Type /Pages /Kids [3 0 R 6 0 R] /Count 2 >>',
+        3: b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] ' + first + b' >>',
+        4: stream(HELLO_CONTENT),
+        5: b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>',
+        6: b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] ' + second + b' >>',
+        7: stream(jpeg(), b' /Type /XObject /Subtype /Image /Width 40 /Height 60 /ColorSpace /DeviceRGB '
+                          b'/BitsPerComponent 8 /Filter /DCTDecode'),
+        8: stream(b'q 612 0 0 792 0 0 cm /Im1 Do Q'),
+    }
+
+
+class EmbeddedImageTests(PDFFileTestCase):
+    def test_first_page_image(self):
+        image = thumbnails._embedded_image(self.write(build_pdf(image_pages(1))))
+        self.assertEqual(image.size, (40, 60))
+
+    def test_images_on_later_pages_ignored(self):
+        self.assertIsNone(thumbnails._embedded_image(self.write(build_pdf(image_pages(2)))))
+
+    def test_missing_file(self):
+        with self.assertRaises(FileNotFoundError):
+            thumbnails._embedded_image(os.path.join(self.directory, 'missing.pdf'))
+
+
+@override_settings(SHARED_CACHE=False)
+class ThumbnailTests(DocumentTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def test_evicted_before_opened(self):
+        document = self.make_document()
+        missing = os.path.join(settings.THUMBNAIL_CACHE_DIR, 'evicted.webp')
+        with mock.patch('documents.thumbnails.get_thumbnail', return_value=missing):
+            response = self.client.get(reverse('documents:thumbnail', args=[document.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Image.open(io.BytesIO(response.content)).format, 'WEBP')
+
+    def test_cache_size_summed_from_directory(self):
+        data = thumbnails.render_thumbnail(self.make_document().pdf_file.path)
+        with self.settings(THUMBNAIL_CACHE_MAX_SIZE=len(data) * 3 // 2):
+            first = thumbnails._store(thumbnails.thumbnail_path('aa1'), data)
+            os.utime(first, (0, 0))
+            # This process's count misses files stored by other processes.
+            cache.set(thumbnails.CACHE_SIZE_KEY, 0)
+            second = thumbnails._store(thumbnails.thumbnail_path('bb2'), data)
+        self.assertFalse(os.path.exists(first))
+        self.assertTrue(os.path.exists(second))
+
+
+class ReconcileMediaTests(DocumentTestCase):
+    def reconcile(self):
+        call_command('reconcile_media', '--delete', '--min-age', '0', stdout=io.StringIO())
+
+    def test_orphaned_blob_deleted(self):
+        document = self.make_document()
+        orphan = pdf_storage.save(blob_name('ab' * 32), ContentFile(b'%PDF-1.4 orphan'))
+        with self.settings(PDF_BLOB_REUSE_GRACE=0):
+            self.reconcile()
+        self.assertFalse(pdf_storage.exists(orphan))
+        self.assertTrue(pdf_storage.exists(document.pdf_file.name))
+
+    def test_recently_reused_blob_kept(self):
+        orphan = pdf_storage.save(blob_name('ab' * 32), ContentFile(b'%PDF-1.4 orphan'))
+        self.reconcile()
+        self.assertTrue(pdf_storage.exists(orphan))
+
+
+@override_settings(PDF_BLOB_REUSE_GRACE=0)
+class SharedBlobTests(DocumentTestCase):
+    def test_identical_uploads_share_a_blob(self):
+        first, second = self.make_document(), self.make_document()
+        self.assertEqual(first.pdf_file.name, second.pdf_file.name)
+        self.assertEqual(first.pdf_file.name, blob_name(first.sha256))
+
+    def test_blob_removed_with_last_document(self):
+        first, second = self.make_document(), self.make_document()
+        name = first.pdf_file.name
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(pdf_storage.exists(name))
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(pdf_storage.exists(name))
+
+    def test_reused_blob_survives_within_grace(self):
+        name = self.make_document().pdf_file.name
+        with self.settings(PDF_BLOB_REUSE_GRACE=3600):
+            self.assertTrue(pdf_storage.reuse(name))
+            self.assertFalse(pdf_storage.delete_unused(name))
+        self.assertTrue(pdf_storage.exists(name))
+        self.assertTrue(pdf_storage.delete_unused(name))
+        self.assertFalse(pdf_storage.exists(name))
+
+
+class ChunkedUploadTests(DocumentTestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        upload_settings = self.settings(PDF_UPLOAD_TEMP_DIR=directory.name)
+        upload_settings.enable()
+        self.addCleanup(upload_settings.disable)
+        self.client.force_login(self.user)
+        self.data = build_pdf(page_objects(HELLO_CONTENT))
+        self.session = start_session(self.user, 'Large file', 'large.pdf', len(self.data), 1, 1)
+        self.url = reverse('documents:upload_session', args=[self.session.pk])
+
+    def put(self, start, end, total=None):
+        return self.client.put(
+            self.url, self.data[start:end], content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE=f'bytes {start}-{end - 1}/{total or len(self.data)}',
+        )
+
+    def test_resume_from_offset(self):
+        self.assertEqual(self.put(0, 100).json()['offset'], 100)
+        # A retried part the server already has is refused with the offset.
+        response = self.put(0, 100)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['offset'], 100)
+        self.assertEqual(self.client.get(self.url).json()['offset'], 100)
+        self.assertEqual(self.put(100, len(self.data)).json()['offset'], len(self.data))
+
+    def test_content_range_mismatch(self):
+        response = self.put(0, 100, total=len(self.data) + 1)
+        self.assertEqual(response.status_code, 400)
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.received, 0)
+
+    def test_complete(self):
+        self.put(0, 100)
+        complete_url = reverse('documents:complete_upload_session', args=[self.session.pk])
+        self.assertEqual(self.client.post(complete_url).status_code, 409)
+        self.put(100, len(self.data))
+        response = self.client.post(complete_url)
+        self.assertEqual(response.status_code, 201)
+        document = PDFDocument.objects.get(pk=response.json()['document_id'])
+        self.assertEqual((document.file_size, document.page_count), (len(self.data), 1))
+        with document.pdf_file.open('rb') as pdf_file:
+            self.assertEqual(pdf_file.read(), self.data)
+        self.assertFalse(UploadSession.objects.filter(pk=self.session.pk).exists())
+        self.assertFalse(os.path.exists(self.session.part_path))
+
+
+@override_settings(THUMBNAIL_RENDER_ON_INGEST=False, SEARCH_MAX_TEXT_LENGTH=1000)
+class RecordResultsTests(DocumentTestCase):
+    def process(self):
+        record_results([parse_job(job) for job in claim_jobs(10, 60, 3)])
+
+    def test_page_count_stored_at_upload(self):
+        document = self.make_document()
+        self.assertEqual(PDFDocument.objects.get(pk=document.pk).page_count, 1)
+
+    def test_results_recorded(self):
+        document = self.make_document()
+        self.process()
+        document.refresh_from_db()
+        self.assertEqual((document.ingest_status, document.page_count), (INGEST_VALID, 1))
+        self.assertEqual(document.text.content, 'Hello searchable world')
+        self.assertFalse(IngestJob.objects.exists())
+
+    def test_file_replaced_while_parsing(self):
+        document = self.make_document()
+        results = [parse_job(job) for job in claim_jobs(10, 60, 3)]
+        document.pdf_file = ContentFile(build_pdf(page_objects(b'BT /F1 12 Tf (Replacement) Tj ET')), name='new.pdf')
+        document.save()
+        record_results(results)
+        document.refresh_from_db()
+        self.assertEqual(document.text.content, '')
+        job = IngestJob.objects.get(document=document)
+        self.assertEqual((job.claimed_at, job.attempts), (None, 0))
+
+        self.process()
+        document.refresh_from_db()
+        self.assertEqual(document.ingest_status, INGEST_VALID)
+        self.assertEqual(document.text.content, 'Replacement')
+
+
+class BulkUploadTests(DocumentTestCase):
+    def test_zip_and_separate_files(self):
+        data = build_pdf(page_objects(HELLO_CONTENT))
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, 'w') as zip_file:
+            zip_file.writestr('minutes.pdf', data)
+            zip_file.writestr('reports/budget.pdf', data)
+            zip_file.writestr('reports/', b'')
+            zip_file.writestr('__MACOSX/._minutes.pdf', b'')
+            zip_file.writestr('notes.txt', b'text')
+            zip_file.writestr('fake.pdf', b'not a pdf')
+        uploads = [
+            SimpleUploadedFile('batch.zip', archive.getvalue()),
+            SimpleUploadedFile('agenda.pdf', data),
+            SimpleUploadedFile('broken.zip', b'not a zip'),
+        ]
+        results = ingest_pdfs(uploads, 1, 2, self.user)
+
+        self.assertEqual([(result.name, result.ok, result.message) for result in results], [
+            ('batch.zip/minutes.pdf', True, "Uploaded"),
+            ('batch.zip/reports/budget.pdf', True, "Uploaded"),
+            ('batch.zip/notes.txt', False, "Only PDF files are allowed."),
+            ('batch.zip/fake.pdf', False, "File is not a PDF document."),
+            ('agenda.pdf', True, "Uploaded"),
+            ('broken.zip', False, "Not a valid ZIP archive."),
+        ])
+        documents = PDFDocument.objects.filter(subcard_id=2).order_by('pk')
+        self.assertEqual([document.title for document in documents], ['minutes', 'budget', 'agenda'])
+        # Identical files share one blob.
+        self.assertEqual({document.pdf_file.name for document in documents}, {blob_name(documents[0].sha256)})
+        self.assertEqual(IngestJob.objects.filter(document__in=documents).count(), 3)
+        self.assertEqual([hit.document.title for hit in search_documents('budget', 10)], ['budget'])
+
+
+@override_settings(PDF_BLOB_REUSE_GRACE=0)
+class TrashTests(DocumentTestCase):
+    def test_soft_delete_and_restore(self):
+        document = self.make_document(title='Quarterly report')
+        kept = self.make_document(title='Other')
+        self.assertEqual(soft_delete(PDFDocument.objects.filter(pk=document.pk)), 1)
+        self.assertEqual(list(PDFDocument.objects.all()), [kept])
+        self.assertTrue(PDFDocument.all_objects.filter(pk=document.pk).exists())
+        self.assertEqual(get_card_tree()[2], 1)
+        self.assertEqual(search_documents('quarterly', 10), [])
+
+        self.assertEqual(restore(PDFDocument.all_objects.filter(pk=document.pk)), 1)
+        self.assertEqual(get_card_tree()[2], 2)
+        self.assertEqual([hit.document.pk for hit in search_documents('quarterly', 10)], [document.pk])
+
+    def test_purge_after_grace_period(self):
+        old, recent, sharing = self.make_document(), self.make_document(), self.make_document()
+        name = old.pdf_file.name
+        soft_delete(PDFDocument.objects.filter(pk__in=[old.pk, recent.pk]))
+        PDFDocument.all_objects.filter(pk=old.pk).update(deleted_at=timezone.now() - timedelta(days=31))
+
+        cutoff = timezone.now() - timedelta(days=30)
+        self.assertEqual(purge_deleted(cutoff), (1, 0, 0))
+        self.assertEqual(set(PDFDocument.all_objects.values_list('pk', flat=True)), {recent.pk, sharing.pk})
+        # Still used by the other two documents.
+        self.assertTrue(pdf_storage.exists(name))
+
+        PDFDocument.all_objects.update(deleted_at=cutoff - timedelta(days=1))
+        self.assertEqual(purge_deleted(cutoff), (2, 1, 0))
+        self.assertFalse(pdf_storage.exists(name))
+
+
+class MoveDocumentsTests(DocumentTestCase):
+    def make_legacy_document(self, name):
+        name = pdf_storage.save(f'pdf_docs/parent_1/sub_1/{name}', ContentFile(build_pdf(page_objects(HELLO_CONTENT))))
+        return PDFDocument.objects.create(title=name, pdf_file=name, uploaded_by=self.user, parent_card_id=1, subcard_id=1)
+
+    def test_blobs_stay_and_legacy_files_move(self):
+        blob_document = self.make_document()
+        legacy = self.make_legacy_document('a.pdf')
+        old_name = legacy.pdf_file.name
+        self.assertEqual(move_documents(PDFDocument.objects.all(), 2, 3), 2)
+
+        blob_document.refresh_from_db()
+        legacy.refresh_from_db()
+        self.assertEqual((blob_document.parent_card_id, blob_document.subcard_id), (2, 3))
+        self.assertEqual(blob_document.pdf_file.name, blob_name(blob_document.sha256))
+        self.assertTrue(legacy.pdf_file.name.startswith('pdf_docs/parent_2/sub_3/'))
+        self.assertTrue(pdf_storage.exists(legacy.pdf_file.name))
+        self.assertFalse(pdf_storage.exists(old_name))
+
+    def test_failed_rename_rolls_back(self):
+        documents = [self.make_legacy_document('a.pdf'), self.make_legacy_document('b.pdf')]
+        names = [document.pdf_file.name for document in documents]
+        calls = []
+
+        def rename(old_path, new_path):
+            calls.append(old_path)
+            if len(calls) == 2:
+                raise PermissionError("read-only")
+            os.replace(old_path, new_path)
+
+        with mock.patch('documents.move.os.rename', side_effect=rename):
+            with self.assertRaises(PermissionError):
+                move_documents(PDFDocument.objects.all(), 2, 3)
+
+        for document, name in zip(documents, names):
+            document.refresh_from_db()
+            self.assertEqual((document.parent_card_id, document.pdf_file.name), (1, name))
+            self.assertTrue(pdf_storage.exists(name))
+        self.assertEqual(os.listdir(pdf_storage.path('pdf_docs/parent_2/sub_3')), [])
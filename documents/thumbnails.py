@@ -0,0 +1,233 @@
+"""
+First-page thumbnails of stored PDFs, kept in a size-bounded disk cache.
+
+Pillow cannot rasterise PDF pages, so the first page is rendered with
+poppler's pdftoppm when it is installed. Without it, the largest JPEG
+image drawn on the first page is used (the page itself, for scanned
+documents), and failing that a plain placeholder page is drawn.
+
+Thumbnails are keyed by the file's SHA-256, so documents sharing a file
+share a thumbnail and a changed file gets a new one. The cache is trimmed
+to THUMBNAIL_CACHE_MAX_SIZE by deleting the least recently used files;
+serving a thumbnail refreshes its modification time, which is the
+recency used for eviction. The cache size is kept in the cache only when
+it is shared between processes; otherwise it is summed from the directory
+on every write, as per-process counts would drift apart.
+"""
+
+import io
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from PIL import Image, ImageDraw
+
+from .pdf_utils import open_pdf
+
+CACHE_SIZE_KEY = 'thumbnails:size'
+# Serving refreshes a thumbnail's mtime at most this often.
+TOUCH_INTERVAL = 60 * 60
+# Eviction trims the cache to this fraction of the budget, so it does
+# not run again on the very next write.
+EVICTION_TARGET = 0.9
+RENDER_TIMEOUT = 30
+
+# Content types by Pillow format name.
+CONTENT_TYPES = {'WEBP': 'image/webp', 'PNG': 'image/png', 'JPEG': 'image/jpeg'}
+
+MAX_EMBEDDED_IMAGE_SIZE = 20 * 1024 * 1024
+
+
+def thumbnail_key(document):
+    if document.sha256:
+        return document.sha256
+    # Not yet backfilled; keyed by row and upload time instead.
+    return f'document-{document.pk}-{int(document.uploaded_at.timestamp())}'
+
+
+def thumbnail_path(key):
+    extension = settings.THUMBNAIL_FORMAT.lower()
+    name = f'{key}-{settings.THUMBNAIL_WIDTH}.{extension}'
+    return os.path.join(settings.THUMBNAIL_CACHE_DIR, key[:2], name)
+
+
+def content_type():
+    return CONTENT_TYPES.get(settings.THUMBNAIL_FORMAT.upper(), 'application/octet-stream')
+
+
+def get_thumbnail(key, pdf_path):
+    """Path of the cached thumbnail for ``key``, rendering it from ``pdf_path`` if needed"""
+    path = thumbnail_path(key)
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return _store(path, render_thumbnail(pdf_path))
+    if time.time() - stat.st_mtime > TOUCH_INTERVAL:
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            # Evicted in the meantime.
+            return _store(path, render_thumbnail(pdf_path))
+    return path
+
+
+def render_thumbnail(pdf_path):
+    """Encoded thumbnail image of the first page of ``pdf_path``"""
+    image = _render_with_pdftoppm(pdf_path) or _embedded_image(pdf_path) or _placeholder()
+    width = settings.THUMBNAIL_WIDTH
+    image.thumbnail((width, width * 2))
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    output = io.BytesIO()
+    image.save(output, format=settings.THUMBNAIL_FORMAT, quality=settings.THUMBNAIL_QUALITY)
+    return output.getvalue()
+
+
+def _render_with_pdftoppm(pdf_path):
+    pdftoppm = shutil.which('pdftoppm')
+    if not pdftoppm:
+        return None
+    with tempfile.TemporaryDirectory() as directory:
+        prefix = os.path.join(directory, 'page')
+        try:
+            subprocess.run(
+                [pdftoppm, '-f', '1', '-l', '1', '-singlefile', '-png',
+                 '-scale-to', str(settings.THUMBNAIL_WIDTH * 2), pdf_path, prefix],
+                check=True, capture_output=True, timeout=RENDER_TIMEOUT,
+            )
+            image = Image.open(prefix + '.png')
+            # Reads the pixels and closes the file before the directory goes.
+            image.load()
+            return image
+        except (OSError, subprocess.SubprocessError):
+            return None
+
+
+def _embedded_image(pdf_path):
+    """The largest JPEG image drawn on the first page, if there is one"""
+    try:
+        with open_pdf(pdf_path) as (structure, reader):
+            if reader is None or not structure.page_count:
+                return None
+            data = _first_page_jpeg(reader.pages[0])
+    except FileNotFoundError:
+        raise
+    except Exception:
+        # pypdf raises assorted errors on malformed files; the placeholder
+        # is drawn instead.
+        return None
+    if data is None:
+        return None
+    try:
+        image = Image.open(io.BytesIO(data))
+        # Let the JPEG decoder scale down while decoding a full-page scan.
+        width = settings.THUMBNAIL_WIDTH
+        image.draft('RGB', (width * 2, width * 4))
+        image.load()
+        return image
+    except OSError:
+        return None
+
+
+def _first_page_jpeg(page):
+    resources = page.get('/Resources')
+    xobjects = resources.get_object().get('/XObject') if resources else None
+    if not xobjects:
+        return None
+    best = None
+    for xobject in xobjects.get_object().values():
+        xobject = xobject.get_object()
+        if xobject.get('/Subtype') != '/Image' or xobject.get('/Filter') != '/DCTDecode':
+            continue
+        area = int(xobject.get('/Width', 0)) * int(xobject.get('/Height', 0))
+        if int(xobject.get('/Length', 0)) <= MAX_EMBEDDED_IMAGE_SIZE and (best is None or area > best[0]):
+            best = (area, xobject)
+    # DCTDecode data is passed through undecoded: it is the JPEG file.
+    return best[1].get_data() if best else None
+
+
+def _placeholder():
+    width = settings.THUMBNAIL_WIDTH
+    height = int(width * 1.414)
+    image = Image.new('RGB', (width, height), 'white')
+    draw = ImageDraw.Draw(image)
+    draw.rectangle([0, 0, width - 1, height - 1], outline=(200, 200, 200), width=2)
+    margin = width // 8
+    for y in range(height // 4, height - margin, max(height // 16, 4)):
+        draw.line([margin, y, width - margin, y], fill=(225, 225, 225), width=2)
+    draw.text((margin, margin), 'PDF', fill=(220, 53, 69))
+    return image
+
+
+def _store(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+    with open(temp_path, 'wb') as thumbnail:
+        thumbnail.write(data)
+    os.replace(temp_path, path)
+    _account(len(data))
+    return path
+
+
+def _account(size):
+    """Add ``size`` bytes to the tracked cache size, evicting when over budget"""
+    if not settings.SHARED_CACHE:
+        total = _scan_size()
+    else:
+        try:
+            total = cache.incr(CACHE_SIZE_KEY, size)
+        except ValueError:
+            total = _scan_size()
+            cache.set(CACHE_SIZE_KEY, total, timeout=None)
+    if total > settings.THUMBNAIL_CACHE_MAX_SIZE:
+        evict()
+
+
+def _scan():
+    """(mtime, size, path) of every cached thumbnail"""
+    entries = []
+    root = settings.THUMBNAIL_CACHE_DIR
+    if not os.path.isdir(root):
+        return entries
+    with os.scandir(root) as directories:
+        for directory in directories:
+            if not directory.is_dir():
+                continue
+            with os.scandir(directory.path) as files:
+                for entry in files:
+                    if entry.is_file() and not entry.name.endswith('.tmp'):
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+    return entries
+
+
+def _scan_size():
+    return sum(size for mtime, size, path in _scan())
+
+
+def evict(max_size=None):
+    """Delete least recently used thumbnails until the cache fits its budget"""
+    if max_size is None:
+        max_size = settings.THUMBNAIL_CACHE_MAX_SIZE
+    entries = _scan()
+    total = sum(size for mtime, size, path in entries)
+    target = max_size * EVICTION_TARGET
+    removed = 0
+    if total > max_size:
+        for mtime, size, path in sorted(entries):
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+    if settings.SHARED_CACHE:
+        cache.set(CACHE_SIZE_KEY, total, timeout=None)
+    return removed
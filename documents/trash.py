@@ -0,0 +1,80 @@
+"""
+Soft deletion of documents.
+
+Deleting a document only sets ``deleted_at``, a single UPDATE however
+many documents are affected, and PDFDocument.objects stops returning it
+at once. The purge_deleted_documents command later removes rows whose
+grace period has passed, in batches, and unlinks files no remaining
+document uses. Until then a document can be restored from the admin.
+"""
+
+from django.db import transaction
+from django.utils import timezone
+
+from .card_tree import mark_cards_changed
+from .models import PDFDocument
+from .storage import pdf_storage
+
+
+def _cards(documents):
+    return documents.values_list('parent_card_id', 'subcard_id').distinct()
+
+
+def soft_delete(documents):
+    """Move the documents in the ``documents`` queryset to the trash and return how many were moved"""
+    documents = documents.filter(deleted_at__isnull=True)
+    with transaction.atomic():
+        cards = list(_cards(documents))
+        count = documents.update(deleted_at=timezone.now())
+    # update() sends no signals.
+    mark_cards_changed(cards)
+    return count
+
+
+def restore(documents):
+    """Take the documents in the ``documents`` queryset out of the trash and return how many were restored"""
+    documents = documents.filter(deleted_at__isnull=False)
+    with transaction.atomic():
+        cards = list(_cards(documents))
+        count = documents.update(deleted_at=None)
+    mark_cards_changed(cards)
+    return count
+
+
+def purge_deleted(cutoff, batch_size=500):
+    """
+    Permanently remove documents deleted before ``cutoff``, with their
+    files once no other document uses them. Returns (documents removed,
+    files removed, files that could not be removed or were reused within
+    PDF_BLOB_REUSE_GRACE).
+    """
+    expired = PDFDocument.all_objects.filter(deleted_at__lt=cutoff)
+    purged = removed = failed = 0
+    last_pk = 0
+    while True:
+        batch = list(expired.filter(pk__gt=last_pk).order_by('pk').values_list('pk', 'pdf_file')[:batch_size])
+        if not batch:
+            break
+        last_pk = batch[-1][0]
+        names = {name for pk, name in batch if name}
+
+        with transaction.atomic():
+            # Documents restored since the batch was read are kept.
+            purged += expired.filter(pk__in=[pk for pk, name in batch]).delete()[1].get(
+                PDFDocument._meta.label, 0
+            )
+            referenced = set(
+                PDFDocument.all_objects.filter(pdf_file__in=names).values_list('pdf_file', flat=True)
+            )
+
+        # A file left behind here is picked up by reconcile_media.
+        for name in names - referenced:
+            try:
+                deleted = pdf_storage.delete_unused(name)
+            except OSError:
+                deleted = False
+            if deleted:
+                removed += 1
+            else:
+                failed += 1
+    return purged, removed, failed
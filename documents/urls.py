@@ -5,9 +5,19 @@ app_name = 'documents'
 
 urlpatterns = [
     path('add-file/', views.AddFileView.as_view(), name='add_file'),
+    path('bulk-upload/', views.BulkUploadView.as_view(), name='bulk_upload'),
+    path('uploads/', views.UploadSessionCreateView.as_view(), name='upload_sessions'),
+    path('uploads/<uuid:session_id>/', views.UploadSessionView.as_view(), name='upload_session'),
+    path('uploads/<uuid:session_id>/complete/', views.UploadSessionCompleteView.as_view(), name='complete_upload_session'),
     path('card-settings/', views.CardSettingsView.as_view(), name='card_settings'),
+    path('move/', views.MoveDocumentsView.as_view(), name='move_documents'),
+    path('search/', views.search, name='search'),
+    path('autocomplete/', views.autocomplete, name='autocomplete'),
     path('view-pdf/<int:document_id>/', views.view_pdf, name='view_pdf'),
+    path('thumbnail/<int:document_id>/', views.thumbnail, name='thumbnail'),
     path('download-pdf/<int:document_id>/', views.download_pdf, name='download_pdf'),
+    path('export/<int:parent_id>/', views.export_card, name='export_card'),
+    path('export/<int:parent_id>/<int:subcard_id>/', views.export_card, name='export_subcard'),
     path('delete-pdf/<int:document_id>/', views.delete_pdf, name='delete_pdf'),
     path('delete-subcard/<int:parent_id>/<int:subcard_id>/', views.delete_subcard, name='delete_subcard'),
 
@@ -2,21 +2,40 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib import messages
-from django.http import HttpResponse, Http404
-from django.views.decorators.csrf import csrf_protect
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
 from django.utils.decorators import method_decorator
 from django.views import View
 from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.urls import reverse
+from django.utils.http import content_disposition_header
 import os
 
-from .models import PDFDocument, CardSettings
-from .forms import PDFUploadForm, CardSettingsForm
+from .models import PDFDocument, CardSettings, UploadSession
+from .forms import PDFUploadForm, BulkPDFUploadForm, ChunkedUploadForm, CardSettingsForm, MoveDocumentsForm
+from .bulk_upload import ingest_pdfs
+from .chunked_upload import UploadError, append_part, complete_session, start_session
+from .delivery import pdf_response
+from .export import stream_card_archive
+from .move import move_documents
+from .search import autocomplete_titles, search_documents
+from .trash import soft_delete
+from . import thumbnails
 
 @method_decorator([login_required, staff_member_required, csrf_protect], name='dispatch')
 class AddFileView(View):
     def get(self, request):
         form = PDFUploadForm()
-        return render(request, 'documents/add_file.html', {'form': form})
+        return render(request, 'documents/add_file.html', self.get_context(form))
+
+    def get_context(self, form):
+        return {
+            'form': form,
+            'max_form_size': settings.PDF_UPLOAD_MAX_SIZE,
+            'max_chunked_size': settings.PDF_CHUNKED_UPLOAD_MAX_SIZE,
+        }
 
     def post(self, request):
         print("=== UPLOAD DEBUG START ===")
@@ -55,7 +74,109 @@ class AddFileView(View):
                 print(f"Field '{field}' errors: {errors}")
 
         print("=== UPLOAD DEBUG END ===")
-        return render(request, 'documents/add_file.html', {'form': form})
+        return render(request, 'documents/add_file.html', self.get_context(form))
+
+# CSRF is checked in post(), after the upload handlers are swapped; the
+# handlers cannot be changed once the CSRF middleware has read request.POST.
+@method_decorator([login_required, staff_member_required, csrf_exempt], name='dispatch')
+class BulkUploadView(View):
+    def get(self, request):
+        form = BulkPDFUploadForm()
+        return render(request, 'documents/bulk_upload.html', {'form': form})
+
+    def post(self, request):
+        # Spool every file to disk; a bulk request can carry hundreds of them.
+        request.upload_handlers = [TemporaryFileUploadHandler(request)]
+        return self._post(request)
+
+    @method_decorator(csrf_protect)
+    def _post(self, request):
+        form = BulkPDFUploadForm(request.POST, request.FILES)
+        if not form.is_valid():
+            return render(request, 'documents/bulk_upload.html', {'form': form})
+
+        results = ingest_pdfs(
+            form.cleaned_data['files'],
+            form.cleaned_data['parent_card_id'],
+            form.cleaned_data['subcard_id'],
+            request.user,
+        )
+        uploaded = sum(1 for result in results if result.ok)
+        if uploaded:
+            messages.success(request, f'{uploaded} of {len(results)} file(s) uploaded successfully!')
+        else:
+            messages.error(request, 'No files were uploaded.')
+
+        return render(request, 'documents/bulk_upload.html', {
+            'form': BulkPDFUploadForm(),
+            'results': results,
+        })
+
+def upload_session_state(session):
+    return {
+        'id': str(session.pk),
+        'url': reverse('documents:upload_session', args=[session.pk]),
+        'complete_url': reverse('documents:complete_upload_session', args=[session.pk]),
+        'size': session.size,
+        'offset': session.received,
+        'chunk_size': settings.PDF_UPLOAD_CHUNK_SIZE,
+    }
+
+def upload_error_response(error, session=None):
+    data = {'error': str(error)}
+    if session is not None:
+        data['offset'] = session.received
+    return JsonResponse(data, status=error.status)
+
+@method_decorator([login_required, staff_member_required, csrf_protect], name='dispatch')
+class UploadSessionCreateView(View):
+    def post(self, request):
+        form = ChunkedUploadForm(request.POST)
+        if not form.is_valid():
+            return JsonResponse({'errors': form.errors}, status=400)
+
+        session = start_session(request.user, **form.cleaned_data)
+        return JsonResponse(upload_session_state(session), status=201)
+
+@method_decorator([login_required, staff_member_required, csrf_protect], name='dispatch')
+class UploadSessionView(View):
+    def get(self, request, session_id):
+        session = get_object_or_404(UploadSession, pk=session_id, user=request.user)
+        return JsonResponse(upload_session_state(session))
+
+    def put(self, request, session_id):
+        session = get_object_or_404(UploadSession, pk=session_id, user=request.user)
+        try:
+            content_length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            content_length = 0
+        try:
+            # The part is read straight from the request stream; request.body
+            # would hold all of it in memory.
+            append_part(session, request, request.META.get('HTTP_CONTENT_RANGE'), content_length)
+        except UploadError as error:
+            return upload_error_response(error, session)
+        return JsonResponse(upload_session_state(session))
+
+    def delete(self, request, session_id):
+        session = get_object_or_404(UploadSession, pk=session_id, user=request.user)
+        session.delete()
+        return JsonResponse({'id': str(session_id), 'deleted': True})
+
+@method_decorator([login_required, staff_member_required, csrf_protect], name='dispatch')
+class UploadSessionCompleteView(View):
+    def post(self, request, session_id):
+        session = get_object_or_404(UploadSession, pk=session_id, user=request.user)
+        try:
+            document = complete_session(session)
+        except UploadError as error:
+            return upload_error_response(error, session)
+
+        messages.success(request, f'File "{document.title}" uploaded successfully!')
+        return JsonResponse({
+            'document_id': document.pk,
+            'redirect_url': reverse('dashboard:admin_dashboard'),
+        }, status=201)
 
 @method_decorator([login_required, staff_member_required, csrf_protect], name='dispatch')
 class CardSettingsView(View):
@@ -75,29 +196,132 @@ class CardSettingsView(View):
 
         return render(request, 'documents/card_settings.html', {'form': form, 'settings': settings_obj})
 
+@method_decorator([login_required, staff_member_required, csrf_protect], name='dispatch')
+class MoveDocumentsView(View):
+    """Move the POSTed ``documents`` ids to ``parent_card_id`` / ``subcard_id``"""
+
+    def post(self, request):
+        form = MoveDocumentsForm(request.POST)
+        if not form.is_valid():
+            return JsonResponse({'errors': form.errors}, status=400)
+
+        moved = move_documents(
+            form.cleaned_data['documents'],
+            form.cleaned_data['parent_card_id'],
+            form.cleaned_data['subcard_id'],
+        )
+        return JsonResponse({
+            'moved': moved,
+            'parent_card_id': form.cleaned_data['parent_card_id'],
+            'subcard_id': form.cleaned_data['subcard_id'],
+        })
+
 @login_required
-def view_pdf(request, document_id):
-    document = get_object_or_404(PDFDocument, id=document_id)
+def search(request):
+    """Full-text search over document titles and contents, as a page or JSON with ?format=json"""
+    query = request.GET.get('q', '').strip()
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page = 1
+    page_size = settings.SEARCH_PAGE_SIZE
 
+    # One extra hit tells whether there is a next page without a COUNT.
+    hits = search_documents(query, page_size + 1, (page - 1) * page_size)
+    next_page = page + 1 if len(hits) > page_size else None
+    hits = hits[:page_size]
+
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'query': query,
+            'page': page,
+            'next_page': next_page,
+            'results': [
+                {
+                    'id': hit.document.id,
+                    'title': hit.document.title,
+                    'parent_card_id': hit.document.parent_card_id,
+                    'subcard_id': hit.document.subcard_id,
+                    'rank': hit.rank,
+                    'headline': hit.headline,
+                    'view_url': reverse('documents:view_pdf', args=[hit.document.id]),
+                    'thumbnail_url': hit.document.get_thumbnail_url(),
+                }
+                for hit in hits
+            ],
+        })
+
+    return render(request, 'documents/search.html', {
+        'query': query,
+        'hits': hits,
+        'page': page,
+        'next_page': next_page,
+    })
+
+@login_required
+@staff_member_required
+def autocomplete(request):
+    """Documents whose title matches ?q=, for lookups while typing a title"""
     try:
-        with open(document.pdf_file.path, 'rb') as pdf_file:
-            response = HttpResponse(pdf_file.read(), content_type='application/pdf')
-            response['Content-Disposition'] = f'inline; filename="{document.get_filename()}"'
-            return response
-    except FileNotFoundError:
-        raise Http404("PDF file not found")
+        limit = min(max(int(request.GET.get('limit', settings.AUTOCOMPLETE_MAX_RESULTS)), 1),
+                    settings.AUTOCOMPLETE_MAX_RESULTS)
+    except ValueError:
+        limit = settings.AUTOCOMPLETE_MAX_RESULTS
+    query = request.GET.get('q', '')
+    return JsonResponse({
+        'query': query,
+        'results': [
+            dict(match, view_url=reverse('documents:view_pdf', args=[match['id']]))
+            for match in autocomplete_titles(query, limit)
+        ],
+    })
 
 @login_required
-def download_pdf(request, document_id):
+def export_card(request, parent_id, subcard_id=None):
+    """Every document of a parent card, or of one subcard, as a ZIP streamed while it is built"""
+    response = StreamingHttpResponse(stream_card_archive(parent_id, subcard_id), content_type='application/zip')
+    name = f'card_{parent_id}' if subcard_id is None else f'card_{parent_id}_{subcard_id}'
+    response['Content-Disposition'] = content_disposition_header(True, f'{name}.zip')
+    return response
+
+@login_required
+def thumbnail(request, document_id):
+    document = get_object_or_404(
+        PDFDocument.objects.only('id', 'pdf_file', 'sha256', 'uploaded_at'), id=document_id
+    )
+    key = thumbnails.thumbnail_key(document)
+    etag = f'"{key}-{settings.THUMBNAIL_WIDTH}"'
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        pdf_path = document.pdf_file.path
+        try:
+            path = thumbnails.get_thumbnail(key, pdf_path)
+        except FileNotFoundError:
+            raise Http404("PDF file not found")
+        try:
+            response = FileResponse(open(path, 'rb'), content_type=thumbnails.content_type())
+        except FileNotFoundError:
+            # Evicted by another request in the meantime; served without storing.
+            response = HttpResponse(thumbnails.render_thumbnail(pdf_path), content_type=thumbnails.content_type())
+
+    response['ETag'] = etag
+    if request.GET.get('v') == key:
+        # Versioned URLs change whenever the file does.
+        patch_cache_control(response, private=True, max_age=365 * 24 * 60 * 60, immutable=True)
+    else:
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+@login_required
+def view_pdf(request, document_id):
     document = get_object_or_404(PDFDocument, id=document_id)
+    return pdf_response(request, document)
 
-    try:
-        with open(document.pdf_file.path, 'rb') as pdf_file:
-            response = HttpResponse(pdf_file.read(), content_type='application/pdf')
-            response['Content-Disposition'] = f'attachment; filename="{document.get_filename()}"'
-            return response
-    except FileNotFoundError:
-        raise Http404("PDF file not found")
+@login_required
+def download_pdf(request, document_id):
+    document = get_object_or_404(PDFDocument, id=document_id)
+    return pdf_response(request, document, as_attachment=True)
 
 @login_required
 @staff_member_required
@@ -105,9 +329,8 @@ def delete_pdf(request, document_id):
     document = get_object_or_404(PDFDocument, id=document_id)
 
     if request.method == 'POST':
-        title = document.title
-        document.delete()
-        messages.success(request, f'File "{title}" deleted successfully!')
+        soft_delete(PDFDocument.objects.filter(pk=document.pk))
+        messages.success(request, f'File "{document.title}" deleted successfully!')
 
     return redirect('dashboard:admin_dashboard')
 
@@ -117,7 +340,6 @@ def delete_pdf(request, document_id):
 def delete_subcard(request, parent_id, subcard_id):
     if request.method == 'POST':
         docs_to_delete = PDFDocument.objects.filter(parent_card_id=parent_id, subcard_id=subcard_id)
-        count = docs_to_delete.count()
-        docs_to_delete.delete()
+        count = soft_delete(docs_to_delete)
         messages.success(request, f"Deleted {count} document(s) under Parent {parent_id} / Subcard {subcard_id}.")
     return redirect('dashboard:admin_dashboard')
\ No newline at end of file
@@ -83,7 +83,54 @@ DATABASES = {
     }
 }
 
+# Cache
+# Local memory by default. Deployments running several worker processes
+# should point this at a shared cache so invalidations reach every worker,
+# e.g. CACHE_BACKEND=django.core.cache.backends.redis.RedisCache and
+# CACHE_LOCATION=redis://127.0.0.1:6379/1
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default=''),
+    }
+}
+
+# Sessions
+# With a shared cache, sessions are read from the cache (every save still
+# writes through to the database) and session users are served from the
+# cache, so a logged-in request that does not modify its session makes no
+# session or user query. Logout and password changes then rely on cache invalidation,
+# which a per-process cache cannot deliver to other workers, so without a
+# shared cache both stay on the database.
+SHARED_CACHE = CACHES['default']['BACKEND'] not in (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+SESSION_ENGINE = config(
+    'SESSION_ENGINE',
+    default='django.contrib.sessions.backends.cached_db' if SHARED_CACHE else 'django.contrib.sessions.backends.db',
+)
+# Seconds a session's user is served from the cache; 0 disables it.
+AUTH_USER_CACHE_TIMEOUT = 15 * 60 if SHARED_CACHE else 0
+
 # Password validation
+# The first hasher hashes new passwords; the others only verify older
+# hashes, which are rehashed with the first at the next login. To switch
+# to Argon2, install argon2-cffi and move its hasher to the top.
+PASSWORD_HASHERS = [
+    'accounts.hashers.PBKDF2PasswordHasher',
+    'accounts.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+# Work factors, as recommended by the calibrate_password_hashers command.
+# 0 keeps Django's default, which the command never goes below.
+PASSWORD_PBKDF2_ITERATIONS = config('PASSWORD_PBKDF2_ITERATIONS', default=0, cast=int)
+PASSWORD_ARGON2_TIME_COST = config('PASSWORD_ARGON2_TIME_COST', default=0, cast=int)
+PASSWORD_ARGON2_MEMORY_COST = config('PASSWORD_ARGON2_MEMORY_COST', default=0, cast=int)  # KiB
+PASSWORD_ARGON2_PARALLELISM = config('PASSWORD_ARGON2_PARALLELISM', default=0, cast=int)
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -117,12 +164,26 @@ MEDIA_ROOT = BASE_DIR / 'media'
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Attempts allowed per client IP address and per email address, as
+# 'count/period' with a period in s, m, h or d (e.g. '10/5m'). Counted in
+# the default cache, which must be shared between workers in production.
+RATE_LIMITS = {
+    'login': {'ip': '30/5m', 'email': '10/15m'},
+    'forgot_password': {'ip': '10/h', 'email': '5/h'},
+    'otp': {'ip': '30/15m', 'email': '10/15m'},
+}
+# Where the client address is read from; behind a reverse proxy that sets
+# it, use HTTP_X_FORWARDED_FOR.
+RATE_LIMIT_IP_HEADER = config('RATE_LIMIT_IP_HEADER', default='REMOTE_ADDR')
+
 # Django-allauth configuration
 SITE_ID = 1
 
+# Both resolve session users from the cache; EmailBackend also handles
+# the admin's username logins.
 AUTHENTICATION_BACKENDS = [
-    'django.contrib.auth.backends.ModelBackend',
-    'allauth.account.auth_backends.AuthenticationBackend',
+    'accounts.backends.EmailBackend',
+    'accounts.backends.SocialAuthenticationBackend',
 ]
 
 # Updated Allauth settings (fix deprecated warnings)
@@ -165,8 +226,82 @@ LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/login/'
 
 # File upload settings
-FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
+FILE_UPLOAD_MAX_MEMORY_SIZE = 2621440  # 2.5MB; larger uploads are spooled to a temporary file
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
+DATA_UPLOAD_MAX_NUMBER_FILES = 1000  # Bulk uploads send many files per request
+PDF_UPLOAD_MAX_SIZE = 10 * 1024 * 1024  # 10MB per PDF
+PDF_BULK_UPLOAD_MAX_FILES = 1000
+
+# Chunked uploads: the client sends large PDFs in parts that are appended
+# to a file in PDF_UPLOAD_TEMP_DIR, so the upload can resume after a
+# dropped connection. Keep the directory on the same filesystem as
+# MEDIA_ROOT so finished files are moved into place instead of copied.
+PDF_CHUNKED_UPLOAD_MAX_SIZE = config('PDF_CHUNKED_UPLOAD_MAX_SIZE', default=1024 * 1024 * 1024, cast=int)  # 1GB
+PDF_UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024  # 8MB per part
+PDF_UPLOAD_TEMP_DIR = config('PDF_UPLOAD_TEMP_DIR', default=str(BASE_DIR / 'upload_parts'))
+PDF_UPLOAD_SESSION_MAX_AGE = 24 * 60 * 60  # Seconds before an idle upload is purged
+
+# Deleted documents stay restorable from the admin this long before the
+# purge_deleted_documents command removes them and their files.
+PDF_DELETE_GRACE_PERIOD = config('PDF_DELETE_GRACE_PERIOD', default=7 * 24 * 60 * 60, cast=int)  # 7 days
+# A blob reused or written this recently is never unlinked, as the upload
+# that reused it may not have committed its row yet. Should exceed the
+# longest upload request.
+PDF_BLOB_REUSE_GRACE = 60 * 60
+
+# PDF delivery
+# 'stream'           - Django streams the file from disk (sendfile via wsgi.file_wrapper)
+# 'x-accel-redirect' - nginx serves the file from an internal location, e.g.
+#                      location /protected-media/ { internal; alias /path/to/media/; }
+# 'x-sendfile'       - Apache/lighttpd mod_xsendfile serves the file
+PDF_DELIVERY_MODE = config('PDF_DELIVERY_MODE', default='stream')
+PDF_ACCEL_REDIRECT_PREFIX = config('PDF_ACCEL_REDIRECT_PREFIX', default='/protected-media/')
+PDF_STREAM_CHUNK_SIZE = 64 * 1024  # 64KB
+
+# First-page thumbnails, cached on disk and trimmed to
+# THUMBNAIL_CACHE_MAX_SIZE by evicting the least recently used ones.
+# Pages are rendered with poppler's pdftoppm when it is installed.
+THUMBNAIL_CACHE_DIR = config('THUMBNAIL_CACHE_DIR', default=str(BASE_DIR / 'thumbnail_cache'))
+THUMBNAIL_CACHE_MAX_SIZE = config('THUMBNAIL_CACHE_MAX_SIZE', default=512 * 1024 * 1024, cast=int)  # 512MB
+THUMBNAIL_WIDTH = 200  # Pixels
+THUMBNAIL_FORMAT = 'WEBP'
+THUMBNAIL_QUALITY = 80
+THUMBNAIL_RENDER_ON_INGEST = config('THUMBNAIL_RENDER_ON_INGEST', default=True, cast=bool)
+
+# Full-text search over the text the ingest queue extracts from PDFs
+SEARCH_MAX_TEXT_LENGTH = 100000  # Characters indexed per document
+# Seconds an ingest worker may spend reading one file and its text. A file
+# that takes longer to parse is marked corrupt; one whose text takes
+# longer is indexed by title only.
+PDF_PARSE_TIME_LIMIT = 60
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'loggers': {
+        # pypdf warns about every damaged structure it works around,
+        # which real-world files have plenty of.
+        'pypdf': {'level': 'ERROR'},
+    },
+}
+SEARCH_PAGE_SIZE = 20
+
+# Title autocomplete on the upload form
+AUTOCOMPLETE_MIN_LENGTH = 3  # Shorter queries cannot use the trigram index
+AUTOCOMPLETE_MAX_RESULTS = 10
+AUTOCOMPLETE_CACHE_TIMEOUT = 300
+
+# Dashboards
+DASHBOARD_RECENT_PDFS = 20  # Rows in the recent uploads table
+DASHBOARD_CARD_PAGE_SIZE = 25  # Documents per page when a subcard is expanded
+# Seconds the card tree snapshot is kept. Changes reach other workers
+# through the shared cache; a per-process cache never hears of them, so
+# there the snapshot is only trusted briefly.
+CARD_TREE_SNAPSHOT_TIMEOUT = None if SHARED_CACHE else 60
+
+# Seconds a worker may reuse its copy of CardSettings; saving the settings
+# invalidates every worker sooner through the shared cache.
+CARD_SETTINGS_CACHE_TIMEOUT = 300
 
 # Security settings
 SECURE_BROWSER_XSS_FILTER = True
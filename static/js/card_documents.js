@@ -0,0 +1,43 @@
+// Loads the document list of a subcard when its collapse panel is first opened.
+document.addEventListener('DOMContentLoaded', function () {
+    function loadInto(list, url, replace) {
+        return fetch(url, { headers: { 'X-Requested-With': 'XMLHttpRequest' } })
+            .then(function (response) {
+                if (!response.ok) {
+                    throw new Error(response.statusText);
+                }
+                return response.text();
+            })
+            .then(function (html) {
+                if (replace) {
+                    list.innerHTML = html;
+                } else {
+                    list.insertAdjacentHTML('beforeend', html);
+                }
+            })
+            .catch(function () {
+                list.insertAdjacentHTML('beforeend', '<li class="list-group-item text-danger">Could not load documents.</li>');
+            });
+    }
+
+    document.querySelectorAll('.card-documents').forEach(function (panel) {
+        var list = panel.querySelector('ul');
+
+        panel.addEventListener('show.bs.collapse', function () {
+            if (panel.dataset.loaded) {
+                return;
+            }
+            panel.dataset.loaded = 'true';
+            loadInto(list, panel.dataset.url, true);
+        });
+
+        list.addEventListener('click', function (event) {
+            var button = event.target.closest('.card-documents-more button');
+            if (!button) {
+                return;
+            }
+            button.closest('li').remove();
+            loadInto(list, button.dataset.url, false);
+        });
+    });
+});
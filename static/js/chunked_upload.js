@@ -0,0 +1,119 @@
+// Uploads PDFs larger than the regular form limit in parts, resuming an
+// interrupted upload of the same file from where the server left off.
+document.addEventListener('DOMContentLoaded', function () {
+    var form = document.getElementById('pdf-upload-form');
+    if (!form) {
+        return;
+    }
+    var fileInput = form.querySelector('input[type="file"]');
+    var progress = document.getElementById('chunked-upload-progress');
+    var progressBar = progress.querySelector('.progress-bar');
+    var status = document.getElementById('chunked-upload-status');
+    var maxFormSize = parseInt(form.dataset.maxFormSize, 10);
+    var csrfToken = form.querySelector('input[name="csrfmiddlewaretoken"]').value;
+
+    function request(method, url, body, headers) {
+        headers = Object.assign({ 'X-CSRFToken': csrfToken }, headers || {});
+        return fetch(url, { method: method, body: body, headers: headers, credentials: 'same-origin' })
+            .then(function (response) {
+                return response.json().then(function (data) {
+                    data.status = response.status;
+                    return data;
+                });
+            });
+    }
+
+    function showProgress(offset, size) {
+        var percent = size ? Math.floor(offset * 100 / size) : 100;
+        progressBar.style.width = percent + '%';
+        progressBar.textContent = percent + '%';
+    }
+
+    function fail(message) {
+        status.textContent = message;
+        status.classList.add('text-danger');
+        form.querySelector('button[type="submit"]').disabled = false;
+    }
+
+    function startSession(file, storageKey) {
+        var saved = localStorage.getItem(storageKey);
+        if (saved) {
+            return request('GET', saved).then(function (session) {
+                return session.status === 200 ? session : createSession(file, storageKey);
+            });
+        }
+        return createSession(file, storageKey);
+    }
+
+    function createSession(file, storageKey) {
+        var data = new FormData();
+        ['title', 'parent_card_id', 'subcard_id'].forEach(function (name) {
+            data.append(name, form.elements[name].value);
+        });
+        data.append('filename', file.name);
+        data.append('size', file.size);
+        return request('POST', form.dataset.sessionsUrl, data).then(function (session) {
+            if (session.status !== 201) {
+                var errors = Object.values(session.errors || {}).map(function (list) { return list.join(' '); });
+                throw new Error(errors.join(' ') || 'Could not start the upload.');
+            }
+            localStorage.setItem(storageKey, session.url);
+            return session;
+        });
+    }
+
+    function sendParts(file, session, retries) {
+        showProgress(session.offset, session.size);
+        if (session.offset >= session.size) {
+            return request('POST', session.complete_url);
+        }
+        var end = Math.min(session.offset + session.chunk_size, session.size);
+        var headers = { 'Content-Range': 'bytes ' + session.offset + '-' + (end - 1) + '/' + session.size };
+        return request('PUT', session.url, file.slice(session.offset, end), headers)
+            .then(function (result) {
+                if (result.status === 200 || result.status === 409) {
+                    // 409: the server has a different offset; continue from it.
+                    session.offset = result.offset;
+                    return sendParts(file, session, 3);
+                }
+                throw new Error(result.error || 'Upload failed.');
+            }, function (error) {
+                if (retries <= 0) {
+                    throw error;
+                }
+                // Connection dropped: ask the server where to continue.
+                return new Promise(function (resolve) { setTimeout(resolve, 2000); })
+                    .then(function () { return request('GET', session.url); })
+                    .then(function (state) {
+                        session.offset = state.offset;
+                        return sendParts(file, session, retries - 1);
+                    });
+            });
+    }
+
+    form.addEventListener('submit', function (event) {
+        var file = fileInput.files[0];
+        if (!file || file.size <= maxFormSize) {
+            return;
+        }
+        event.preventDefault();
+        form.querySelector('button[type="submit"]').disabled = true;
+        progress.classList.remove('d-none');
+        status.classList.remove('text-danger');
+        status.textContent = 'Uploading ' + file.name + '...';
+
+        var storageKey = 'chunked-upload:' + [file.name, file.size, file.lastModified].join(':');
+        startSession(file, storageKey)
+            .then(function (session) { return sendParts(file, session, 3); })
+            .then(function (result) {
+                if (result.status !== 201) {
+                    throw new Error(result.error || 'Upload failed.');
+                }
+                localStorage.removeItem(storageKey);
+                window.location = result.redirect_url;
+            })
+            .catch(function (error) {
+                fail(error.message + ' Submit again to resume.');
+            });
+    });
+});
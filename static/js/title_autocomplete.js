@@ -0,0 +1,54 @@
+// Lists documents with similar titles while a title is typed, so staff can
+// spot duplicates before uploading.
+document.addEventListener('DOMContentLoaded', function () {
+    var input = document.querySelector('[data-autocomplete-url]');
+    var list = document.getElementById('title-matches');
+    if (!input || !list) {
+        return;
+    }
+    var minLength = parseInt(input.dataset.autocompleteMinLength, 10) || 3;
+    var timer = null;
+    var latest = 0;
+
+    function show(results) {
+        list.innerHTML = '';
+        results.forEach(function (result) {
+            var item = document.createElement('a');
+            item.className = 'list-group-item list-group-item-action small';
+            item.href = result.view_url;
+            item.target = '_blank';
+            item.textContent = result.title + ' (card ' + result.parent_card_id + ' / ' + result.subcard_id + ')';
+            list.appendChild(item);
+        });
+        list.classList.toggle('d-none', results.length === 0);
+    }
+
+    input.addEventListener('input', function () {
+        clearTimeout(timer);
+        var query = input.value.trim();
+        if (query.length < minLength) {
+            show([]);
+            return;
+        }
+        timer = setTimeout(function () {
+            var request = ++latest;
+            var url = input.dataset.autocompleteUrl + '?q=' + encodeURIComponent(query);
+            fetch(url, { headers: { 'X-Requested-With': 'XMLHttpRequest' } })
+                .then(function (response) {
+                    if (!response.ok) {
+                        throw new Error(response.statusText);
+                    }
+                    return response.json();
+                })
+                .then(function (data) {
+                    // Ignore answers to queries typed over since.
+                    if (request === latest) {
+                        show(data.results);
+                    }
+                })
+                .catch(function () {
+                    show([]);
+                });
+        }, 200);
+    });
+});